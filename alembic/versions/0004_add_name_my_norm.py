@@ -0,0 +1,48 @@
+"""add normalised Burmese name column with trigram index
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.burmese import normalize_my
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("wards", "villages")
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    for table in TABLES:
+        op.add_column(table, sa.Column("name_my_norm", sa.String(255), nullable=True))
+
+        # Backfill in Python — Zawgyi detection/conversion has no SQL equivalent
+        rows = conn.execute(sa.text(f"SELECT id, name_my FROM {table} WHERE name_my IS NOT NULL")).fetchall()
+        updates = [{"id": r.id, "name_my_norm": normalize_my(r.name_my)} for r in rows]
+        if updates:
+            conn.execute(sa.text(f"UPDATE {table} SET name_my_norm = :name_my_norm WHERE id = :id"), updates)
+
+        # Trigram index for Burmese search (pg_trgm needs a UTF-8 ctype to see Burmese letters)
+        op.create_index(
+            f"idx_{table}_name_my_norm_trgm",
+            table,
+            ["name_my_norm"],
+            postgresql_using="gin",
+            postgresql_ops={"name_my_norm": "gin_trgm_ops"},
+        )
+
+
+def downgrade() -> None:
+    for table in reversed(TABLES):
+        op.drop_index(f"idx_{table}_name_my_norm_trgm", table_name=table)
+        op.drop_column(table, "name_my_norm")
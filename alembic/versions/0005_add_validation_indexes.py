@@ -0,0 +1,45 @@
+"""add indexes for the validation lookups
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # check_ward / check_village: townships.code → (township_id, code).
+    # The (township_id, code) indexes also serve the per-township lookups,
+    # so the township_id-only ones from 0001 go.
+    op.create_index("idx_townships_code", "townships", ["code"])
+    op.create_index("idx_wards_township_code", "wards", ["township_id", "code"])
+    op.create_index("idx_villages_township_code", "villages", ["township_id", "code"])
+    op.drop_index("idx_wards_township", table_name="wards")
+    op.drop_index("idx_villages_township", table_name="villages")
+
+    # check_icd10_code: DHIS2 option code
+    op.create_index("idx_icd10_code", "icd10_codes", ["code"])
+
+    # Unfiltered /icd10 pages (ORDER BY icd_code, name): read in index order,
+    # without a sort. Replaces the icd_code-only index from 0003.
+    op.create_index("idx_icd10_icd_code_name", "icd10_codes", ["icd_code", "name"])
+    op.drop_index("idx_icd10_icd_code", table_name="icd10_codes")
+
+
+def downgrade() -> None:
+    op.create_index("idx_icd10_icd_code", "icd10_codes", ["icd_code"])
+    op.drop_index("idx_icd10_icd_code_name", table_name="icd10_codes")
+    op.drop_index("idx_icd10_code", table_name="icd10_codes")
+    op.create_index("idx_villages_township", "villages", ["township_id"])
+    op.create_index("idx_wards_township", "wards", ["township_id"])
+    op.drop_index("idx_villages_township_code", table_name="villages")
+    op.drop_index("idx_wards_township_code", table_name="wards")
+    op.drop_index("idx_townships_code", table_name="townships")
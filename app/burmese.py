@@ -0,0 +1,34 @@
+"""
+Normalisation of Burmese text for search.
+
+Field staff type Burmese in either Unicode or the legacy Zawgyi encoding, and
+the DHIS2 translations are not consistent either. Both stored names and queries
+go through normalize_my() so they meet in the same form: Zawgyi is detected and
+converted to Unicode, then everything is NFC-normalised.
+"""
+import re
+import unicodedata
+
+from icu import Transliterator
+from myanmartools import ZawgyiDetector
+
+ZAWGYI_THRESHOLD = 0.95
+
+# Myanmar, Myanmar Extended-A and Extended-B blocks
+_MYANMAR_CHARS = re.compile("[\u1000-\u109F\uAA60-\uAA7F\uA9E0-\uA9FF]")
+
+_detector = ZawgyiDetector()
+_zawgyi_to_unicode = Transliterator.createInstance("Zawgyi-my")
+
+
+def is_myanmar(s: str) -> bool:
+    return _MYANMAR_CHARS.search(s) is not None
+
+
+def normalize_my(s: str | None) -> str | None:
+    if not s:
+        return None
+    s = s.strip()
+    if _detector.get_zawgyi_probability(s) > ZAWGYI_THRESHOLD:
+        s = _zawgyi_to_unicode.transliterate(s)
+    return unicodedata.normalize("NFC", s) or None
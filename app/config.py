@@ -3,6 +3,21 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    # Comma-separated read-replica URLs for lookup and validation reads (optional)
+    DATABASE_REPLICA_URLS: str = ""
+    REPLICA_HEALTH_INTERVAL: int = 10          # seconds between replica health checks
+    REPLICA_HEALTH_TIMEOUT: float = 2.0
+
+    # Postgres connection pools (the primary and each replica get their own)
+    DB_POOL_SIZE: int = 10                     # connections kept open
+    DB_MAX_OVERFLOW: int = 20                  # extra connections under bursts, closed when returned
+    DB_POOL_TIMEOUT: float = 10.0              # max seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800                # replace connections older than this (seconds); -1 never
+    DB_POOL_PRE_PING: bool = True              # test connections on checkout, dropping ones a restart killed
+    DB_STATEMENT_CACHE_SIZE: int = 200         # prepared statements kept per connection; 0 for pgbouncer (transaction mode)
+    DB_CONNECT_TIMEOUT: float = 5.0            # seconds; past this Postgres counts as down
+    DB_POOL_WARM: int = 5                      # connections per engine opened and prepared at (re)load, up to DB_POOL_SIZE
+
     DHIS2_BASE_URL: str = ""
     DHIS2_USERNAME: str = ""
     DHIS2_PASSWORD: str = ""
@@ -11,6 +26,46 @@ class Settings(BaseSettings):
     VILLAGE_OPTIONSET_UID: str = ""
     ICD10_OPTIONSET_UID: str = "MDNwHnWn2Ik"
 
+    # Last-known-good copy of the reference data, served at startup and while Postgres is down
+    REFERENCE_SNAPSHOT_PATH: str = "reference_snapshot.json.gz"   # empty disables the snapshot
+    REFERENCE_REFRESH_INTERVAL: float = 15.0   # seconds between reload attempts while stale
+    REFERENCE_CHECK_INTERVAL: float = 60.0     # seconds between version checks while current
+    REFERENCE_LOAD_TIMEOUT: float = 60.0
+
+    # /proxy/tracker: remember validation outcomes of byte-identical retries
+    VALIDATION_CACHE_TTL: int = 300            # seconds, 0 disables the cache
+    VALIDATION_CACHE_MAX_ENTRIES: int = 2000
+
+    # Nearest valid wards/villages offered with address validation errors
+    SUGGESTION_COUNT: int = 3
+
+    # Overall budget for one /proxy/tracker request (validation + relay)
+    PROXY_DEADLINE_SECONDS: float = 55.0
+
+    # Relays to DHIS2: connection pool, admission control and circuit breaker
+    DHIS2_TIMEOUT: float = 60.0
+    DHIS2_CONNECT_TIMEOUT: float = 5.0
+    DHIS2_MAX_CONNECTIONS: int = 50
+    DHIS2_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    RELAY_MAX_IN_FLIGHT: int = 40              # concurrent relays
+    RELAY_MAX_QUEUED: int = 100                # relays waiting for a slot; beyond this → 503
+    RELAY_QUEUE_TIMEOUT: float = 10.0          # max seconds to wait for a slot
+    BREAKER_FAILURE_THRESHOLD: int = 5         # consecutive failed/slow relays that open the breaker
+    BREAKER_SLOW_SECONDS: float = 20.0         # a relay slower than this counts as failed
+    BREAKER_RESET_SECONDS: float = 30.0        # how long the breaker stays open before a probe
+
+    # Diagnostics
+    LOOP_STALL_THRESHOLD_MS: float = 200.0     # log a stack when the event loop is blocked longer; 0 disables
+    SLOW_QUERY_MS: float = 500.0               # log statements slower than this; 0 disables
+    SLOW_QUERY_EXPLAIN: bool = False           # also log EXPLAIN (ANALYZE) for slow SELECTs (re-run in the background)
+
+    # Per-request profiling: send `X-Profile: <token>` to get a pyinstrument report
+    PROFILE_TOKEN: str = ""                    # empty disables profiling
+    PROFILE_INTERVAL: float = 0.001            # sampling interval, seconds
+
+    # /wards, /villages, /icd10: have Postgres render the JSON response body
+    DB_RENDERED_JSON: bool = False
+
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
 
@@ -1,9 +1,48 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+import asyncio
+import itertools
+import logging
+from typing import Awaitable, Callable
+from uuid import uuid4
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, InterfaceError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 
 from app.config import settings
 
-engine = create_async_engine(settings.DATABASE_URL, echo=False)
+logger = logging.getLogger(__name__)
+
+
+def make_engine(url: str, statement_cache_size: int | None = None) -> AsyncEngine:
+    """An engine with the pool and asyncpg settings from Settings."""
+    if statement_cache_size is None:
+        statement_cache_size = settings.DB_STATEMENT_CACHE_SIZE
+    connect_args = {
+        # Fail fast when Postgres is down, so requests fall back to the in-memory reference data
+        "timeout": settings.DB_CONNECT_TIMEOUT,
+        # Statements run as server-side prepared statements, kept per connection keyed by SQL text
+        "prepared_statement_cache_size": statement_cache_size,
+    }
+    if statement_cache_size == 0:
+        # Nothing cached, for pgbouncer in transaction mode: consecutive statements may
+        # reach different server connections, so asyncpg must not cache statements either,
+        # and the names of the ones it still prepares must never repeat.
+        connect_args["statement_cache_size"] = 0
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
+    return create_async_engine(
+        url,
+        echo=False,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+
+engine = make_engine(settings.DATABASE_URL)
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
 
@@ -14,3 +53,165 @@ class Base(DeclarativeBase):
 async def get_db() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
+
+
+# ── Read replicas ────────────────────────────────────────────────────────────
+#
+# Lookup and validation traffic only reads, so it can be served by streaming
+# replicas instead of the primary that DHIS2 also uses. Replicas are
+# health-checked in the background; when none is healthy, reads go to the primary.
+
+class ReplicaSession(AsyncSession):
+    """
+    Session on a read replica. A statement that finds the replica unreachable
+    marks it down and is retried on the primary, where the session then stays:
+    a dead replica costs one failed attempt, and only the primary being
+    unreachable makes the app fall back to the in-memory reference data.
+    """
+
+    def __init__(self, *args, replica: "ReadReplica", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replica = replica
+
+    async def execute(self, *args, **kwargs):
+        try:
+            return await super().execute(*args, **kwargs)
+        except Exception as exc:
+            if self.bind is not self.replica.engine or not is_unavailable(exc):
+                raise
+            self.replica.mark_down(exc)
+            await self.rollback()
+            self.bind = engine
+            self.sync_session.bind = engine.sync_engine
+            return await super().execute(*args, **kwargs)
+
+
+class ReadReplica:
+    def __init__(self, url: str):
+        self.engine = make_engine(url)
+        self.sessionmaker = async_sessionmaker(self.engine, class_=ReplicaSession, expire_on_commit=False, replica=self)
+        self.healthy = True
+
+    @property
+    def name(self) -> str:
+        return f"{self.engine.url.host}:{self.engine.url.port or 5432}"
+
+    def mark_down(self, exc: BaseException) -> None:
+        if self.healthy:
+            logger.warning("Read replica %s is down, routing its reads to the primary: %s", self.name, exc)
+        self.healthy = False
+
+
+replicas = [ReadReplica(url.strip()) for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+_next_replica = itertools.count()
+
+
+def read_sessionmaker() -> async_sessionmaker:
+    """Round-robin over healthy replicas, falling back to the primary."""
+    healthy = [r for r in replicas if r.healthy]
+    if not healthy:
+        return AsyncSessionLocal
+    return healthy[next(_next_replica) % len(healthy)].sessionmaker
+
+
+async def get_read_db() -> AsyncSession:
+    async with read_sessionmaker()() as session:
+        yield session
+
+
+async def check_replicas() -> None:
+    for replica in replicas:
+        try:
+            async with asyncio.timeout(settings.REPLICA_HEALTH_TIMEOUT):
+                async with replica.engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+        except Exception as exc:
+            replica.mark_down(exc)
+        else:
+            if not replica.healthy:
+                logger.info("Read replica %s is back", replica.name)
+            replica.healthy = True
+
+
+async def monitor_replicas() -> None:
+    while True:
+        await check_replicas()
+        await asyncio.sleep(settings.REPLICA_HEALTH_INTERVAL)
+
+
+def all_engines() -> list[AsyncEngine]:
+    return [engine, *(r.engine for r in replicas)]
+
+
+async def dispose_engines() -> None:
+    for replica in replicas:
+        await replica.engine.dispose()
+    await engine.dispose()
+
+
+# Postgres SQLSTATEs for "the server is there but not accepting work": admin/crash shutdown, starting up
+_UNAVAILABLE_SQLSTATES = {"57P01", "57P02", "57P03"}
+
+
+def is_unavailable(exc: BaseException) -> bool:
+    """Whether `exc` means Postgres could not be reached, as opposed to a failed query."""
+    if isinstance(exc, OSError):    # includes connection refused and connect timeouts
+        return True
+    if isinstance(exc, DBAPIError):
+        if exc.connection_invalidated or isinstance(exc, InterfaceError):
+            return True
+        sqlstate = getattr(exc.orig, "sqlstate", None) or ""
+        return sqlstate.startswith("08") or sqlstate in _UNAVAILABLE_SQLSTATES
+    return False
+
+
+async def warm_pool(e: AsyncEngine, connections: int, prepare: Callable[[AsyncConnection], Awaitable[None]]) -> None:
+    """
+    Open `connections` pooled connections at once and run `prepare` on each, so
+    the first requests after a start find connected sessions with their
+    statements already prepared.
+    """
+    async def warm_one() -> None:
+        async with e.connect() as conn:
+            await prepare(conn)
+
+    await asyncio.gather(*(warm_one() for _ in range(connections)))
+
+
+def _pool_stats(e: AsyncEngine) -> dict:
+    pool = e.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+
+
+def pool_metrics() -> dict:
+    return {
+        "primary": _pool_stats(engine),
+        "replicas": {
+            r.name: {"healthy": r.healthy, **_pool_stats(r.engine)}
+            for r in replicas
+        },
+    }
+
+
+async def fetch_json_array(db: AsyncSession, query: str, params: dict) -> str:
+    """
+    Run `query` and let Postgres render its rows as a JSON array, column names
+    as keys and in the query's ORDER BY order. The result can be returned as the
+    response body as-is, skipping row → model → JSON in Python.
+
+    json_agg over an ordered subquery doesn't promise to keep that order, so the
+    rows are numbered as the query returns them and aggregated by that number.
+    """
+    row = await db.execute(
+        text(
+            "SELECT coalesce(json_agg(to_jsonb(r) - '_rn' ORDER BY r._rn), '[]')::text "
+            f"FROM (SELECT q.*, row_number() OVER () AS _rn FROM ({query}) q) r"
+        ),
+        params,
+    )
+    return row.scalar_one()
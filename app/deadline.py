@@ -0,0 +1,54 @@
+"""
+Per-request deadline for /proxy/tracker.
+
+One budget covers the whole request: reading the body, the validation
+queries (as a Postgres statement_timeout) and the relay to DHIS2 (as an
+asyncio timeout around the call). Once it has passed, the work is cut off
+and the client gets a 504 instead of DHIS2 importing data nobody is waiting
+for.
+"""
+import asyncio
+
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+
+DEADLINE_HEADER = "X-Request-Timeout"   # seconds; can shorten the configured budget, not extend it
+QUERY_CANCELED = "57014"                # Postgres SQLSTATE for statement_timeout
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.expires_at = asyncio.get_running_loop().time() + seconds
+
+    @classmethod
+    def from_request(cls, request: Request) -> "Deadline":
+        budget = settings.PROXY_DEADLINE_SECONDS
+        try:
+            requested = float(request.headers.get(DEADLINE_HEADER, ""))
+        except ValueError:
+            pass
+        else:
+            if requested > 0:
+                budget = min(budget, requested)
+        return cls(budget)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - asyncio.get_running_loop().time())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+async def set_statement_timeout(db: AsyncSession, deadline: Deadline) -> None:
+    """Cap every statement of the session's current transaction at the time left."""
+    ms = max(1, int(deadline.remaining() * 1000))
+    await db.execute(text("SELECT set_config('statement_timeout', :ms, true)"), {"ms": str(ms)})
+
+
+def is_statement_timeout(exc: DBAPIError) -> bool:
+    return getattr(exc.orig, "sqlstate", None) == QUERY_CANCELED
@@ -0,0 +1,178 @@
+"""
+In-memory ICD10 chapter → block → category → subcategory tree.
+
+Built with the reference data from the `icd_code` column of the ICD10Table
+(the code prefix the loader extracts from each option name with
+extract_icd_code), so browsing never touches the database. Chapters are the
+fixed WHO ICD-10 ranges; blocks come from range entries in the option set
+(e.g. "A00-A09 Intestinal infectious diseases") — categories not covered by
+any block hang directly off their chapter.
+
+Only the shape of the tree is held: for each node that has children, their
+row numbers in the table (or ids, for chapters and for categories that are
+not options themselves). Node names, UIDs and codes are read from the table
+when a node's children are requested.
+"""
+import re
+import sys
+from array import array
+
+from app.reference_tables import ICD10Table
+from app.schemas import ICD10NodeOut
+
+# (chapter, first category, last category, title)
+CHAPTERS = [
+    ("I", "A00", "B99", "Certain infectious and parasitic diseases"),
+    ("II", "C00", "D48", "Neoplasms"),
+    ("III", "D50", "D89", "Diseases of the blood and blood-forming organs and certain disorders involving the immune mechanism"),
+    ("IV", "E00", "E90", "Endocrine, nutritional and metabolic diseases"),
+    ("V", "F00", "F99", "Mental and behavioural disorders"),
+    ("VI", "G00", "G99", "Diseases of the nervous system"),
+    ("VII", "H00", "H59", "Diseases of the eye and adnexa"),
+    ("VIII", "H60", "H95", "Diseases of the ear and mastoid process"),
+    ("IX", "I00", "I99", "Diseases of the circulatory system"),
+    ("X", "J00", "J99", "Diseases of the respiratory system"),
+    ("XI", "K00", "K93", "Diseases of the digestive system"),
+    ("XII", "L00", "L99", "Diseases of the skin and subcutaneous tissue"),
+    ("XIII", "M00", "M99", "Diseases of the musculoskeletal system and connective tissue"),
+    ("XIV", "N00", "N99", "Diseases of the genitourinary system"),
+    ("XV", "O00", "O99", "Pregnancy, childbirth and the puerperium"),
+    ("XVI", "P00", "P96", "Certain conditions originating in the perinatal period"),
+    ("XVII", "Q00", "Q99", "Congenital malformations, deformations and chromosomal abnormalities"),
+    ("XVIII", "R00", "R99", "Symptoms, signs and abnormal clinical and laboratory findings, not elsewhere classified"),
+    ("XIX", "S00", "T98", "Injury, poisoning and certain other consequences of external causes"),
+    ("XX", "V01", "Y98", "External causes of morbidity and mortality"),
+    ("XXI", "Z00", "Z99", "Factors influencing health status and contact with health services"),
+    ("XXII", "U00", "U85", "Codes for special purposes"),
+]
+
+_BLOCK = re.compile(r"^([A-Z]\d\d)-([A-Z]\d\d)$")
+_CATEGORY = re.compile(r"^[A-Z]\d\d$")
+_SUBCATEGORY = re.compile(r"^([A-Z]\d\d)\.?\d+$")
+
+
+def chapter_of(category: str) -> str | None:
+    for chapter, first, last, _ in CHAPTERS:
+        if first <= category <= last:
+            return chapter
+    return None
+
+
+def _title(name: str) -> str:
+    parts = name.split(" ", 1)
+    return parts[1] if len(parts) == 2 else name
+
+
+class ICD10Tree:
+    ROOT = ""
+
+    def __init__(self, table: ICD10Table):
+        self._table = table
+        # parent id → children: row number in the table, or -1 - index into _synthetic
+        self._children: dict[str, array] = {}
+        self._synthetic: list[str] = []         # chapters, and categories that are not options
+        self._block_ranges: list[tuple[str, str, str]] = []   # (first, last, block id)
+
+    def _add(self, node_id: str, parent: str, row: int | None = None) -> None:
+        if row is None:
+            self._synthetic.append(node_id)
+            row = -len(self._synthetic)
+        self._children.setdefault(parent, array("i")).append(row)
+
+    @classmethod
+    def build(cls, table: ICD10Table) -> "ICD10Tree":
+        tree = cls(table)
+        for chapter, _, _, _ in CHAPTERS:
+            tree._add(chapter, cls.ROOT)
+
+        blocks, categories, subcategories = [], {}, []
+        for row in range(len(table)):
+            icd = (table.icd_code[row] or "").upper()
+            if _BLOCK.match(icd):
+                blocks.append((icd, row))
+            elif _CATEGORY.match(icd):
+                categories[icd] = row
+            elif _SUBCATEGORY.match(icd):
+                subcategories.append((icd, row))
+
+        added: set[str] = set()
+        for icd, row in sorted(blocks, key=lambda b: b[0]):
+            first, last = _BLOCK.match(icd).groups()
+            chapter = chapter_of(first)
+            if chapter is None or icd in added:
+                continue
+            tree._add(icd, chapter, row)
+            tree._block_ranges.append((first, last, icd))
+            added.add(icd)
+
+        def add_category(category: str, row: int | None = None) -> bool:
+            parent = tree._category_parent(category)
+            if parent is None:
+                return False
+            tree._add(category, parent, row)   # no row: subcategories whose category is not itself an option
+            added.add(category)
+            return True
+
+        for category in sorted(categories):
+            add_category(category, categories[category])
+
+        for icd, row in sorted(subcategories, key=lambda s: s[0]):
+            category = _SUBCATEGORY.match(icd).group(1)
+            if category not in added and not add_category(category):
+                continue
+            if icd not in added:
+                tree._add(icd, category, row)
+                added.add(icd)
+        return tree
+
+    def _category_parent(self, category: str) -> str | None:
+        for first, last, block in self._block_ranges:
+            if first <= category <= last:
+                return block
+        return chapter_of(category)
+
+    def _parent(self, node_id: str) -> str | None:
+        """Where a node with this id would hang, from the id alone."""
+        if any(node_id == chapter for chapter, _, _, _ in CHAPTERS):
+            return self.ROOT
+        if m := _BLOCK.match(node_id):
+            return chapter_of(m.group(1))
+        if _CATEGORY.match(node_id):
+            return self._category_parent(node_id)
+        if m := _SUBCATEGORY.match(node_id):
+            return m.group(1)
+        return None
+
+    def _id(self, ref: int) -> str:
+        return self._synthetic[-1 - ref] if ref < 0 else self._table.icd_code[ref].upper()
+
+    def _node(self, ref: int) -> ICD10NodeOut:
+        node_id = self._id(ref)
+        children = len(self._children.get(node_id, ()))
+        if ref >= 0:
+            t = self._table
+            kind = "block" if _BLOCK.match(node_id) else "category" if _CATEGORY.match(node_id) else "subcategory"
+            return ICD10NodeOut(id=node_id, kind=kind, name=_title(t.name[ref]), uid=t.uid[ref], code=t.code[ref],
+                                child_count=children)
+        for chapter, first, last, title in CHAPTERS:
+            if node_id == chapter:
+                return ICD10NodeOut(id=node_id, kind="chapter", name=f"{title} ({first}-{last})", uid=None,
+                                    code=None, child_count=children)
+        return ICD10NodeOut(id=node_id, kind="category", name=node_id, uid=None, code=None, child_count=children)
+
+    def children(self, node_id: str = ROOT) -> list[ICD10NodeOut] | None:
+        """Children of a node (chapters for the root), or None if the node does not exist."""
+        refs = self._children.get(node_id)
+        if refs is None:
+            parent = self._parent(node_id)
+            if parent is None or all(self._id(ref) != node_id for ref in self._children.get(parent, ())):
+                return None
+            refs = ()
+        return [self._node(ref) for ref in refs]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the tree itself; the names and codes it serves are the ICD10Table's."""
+        return (sys.getsizeof(self._children) + sys.getsizeof(self._synthetic) + sys.getsizeof(self._block_ranges)
+                + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in self._children.items())
+                + sum(sys.getsizeof(s) for s in self._synthetic))
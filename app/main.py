@@ -1,51 +1,269 @@
-from contextlib import asynccontextmanager
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager, suppress
+from pathlib import Path
 
 import httpx
 from fastapi import FastAPI, Request
-from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncConnection
 
-from app.database import AsyncSessionLocal
-from app.models import Township
-from app.routers.icd10 import router as icd10_router
+from app.config import settings
+from app.database import (
+    AsyncSessionLocal,
+    all_engines,
+    dispose_engines,
+    is_unavailable,
+    monitor_replicas,
+    pool_metrics,
+    replicas,
+    warm_pool,
+)
+from app.monitoring import LoopStallMonitor, install_slow_query_log
+from app.profiling import profile_request, wants_profile
+from app.reference import ReferenceData, reference_store, reference_version
+from app.relay_guard import CircuitBreaker, RelayGuard
+from app.routers.icd10 import router as icd10_router, search_icd10
 from app.routers.proxy import router as proxy_router
 from app.routers.validate import router as validate_router
-from app.routers.villages import router as villages_router
-from app.schemas import TownshipOut
+from app.routers.villages import router as villages_router, search_address, search_villages, search_wards
+from app.timing import Timings, current_timings
+from app.validation import check_icd10_code, check_village, check_ward, existing_keys
+from app.validation_cache import ValidationCache
+
+logger = logging.getLogger(__name__)
+
+
+# ── Reference data ───────────────────────────────────────────────────────────
+
+def publish_reference(app: FastAPI) -> None:
+    app.state.townships_cache = reference_store.townships
+    app.state.icd10_tree = reference_store.icd10_tree
+    app.state.reference_version = reference_store.version
+
+
+def read_snapshot() -> ReferenceData | None:
+    path = settings.REFERENCE_SNAPSHOT_PATH
+    if not path or not Path(path).exists():
+        return None
+    try:
+        return ReferenceData.read(Path(path))
+    except Exception as exc:
+        logger.warning("Ignoring unreadable reference snapshot %s: %s", path, exc)
+        return None
+
+
+async def prepare_statements(conn: AsyncConnection) -> None:
+    """Issue every request-path query once, so asyncpg has them prepared on this connection."""
+    await check_ward(conn, "", "")
+    await check_village(conn, "", "")
+    await check_icd10_code(conn, "")
+    await existing_keys(conn, "ward", {("", "")})
+    await existing_keys(conn, "village", {("", "")})
+    await existing_keys(conn, "icd10", {("",)})
+    for q in (None, "a", "\u1000"):
+        await search_wards(township_uid="", q=q, limit=1, db=conn)
+        await search_villages(township_uid="", q=q, limit=1, db=conn)
+    for q in ("a", "\u1000"):
+        await search_address(township_uid="", q=q, limit=1, db=conn)
+    for q in (None, "aaa", "A00"):
+        await search_icd10(q=q, page=1, limit=1, db=conn)
+
+
+async def load_reference(app: FastAPI) -> None:
+    """
+    Bring the reference data up to date with Postgres and save it as the snapshot.
+    The connection pools are warmed after a reload, or when the data was stale
+    (at startup from the snapshot, or once Postgres is back).
+    """
+    was_stale = reference_store.stale
+    async with AsyncSessionLocal() as session:
+        # Usually the snapshot is current (the gunicorn master refreshes it before starting workers)
+        if await reference_version(session) == reference_store.version:
+            data = None
+        else:
+            data = await ReferenceData.from_db(session)
+
+    if data is None:
+        reference_store.confirm()
+        if was_stale:
+            logger.info("Reference data matches the database (version %s)", reference_store.version)
+    else:
+        await reference_store.use(data, "database")
+        publish_reference(app)
+        logger.info("Reference data loaded from the database (version %s)", data.version)
+        if settings.REFERENCE_SNAPSHOT_PATH:
+            try:
+                await asyncio.to_thread(data.write, Path(settings.REFERENCE_SNAPSHOT_PATH))
+            except OSError as exc:
+                logger.warning("Could not write reference snapshot %s: %s", settings.REFERENCE_SNAPSHOT_PATH, exc)
+
+    if settings.DB_POOL_WARM > 0 and (data is not None or was_stale):
+        for e in all_engines():
+            try:
+                await warm_pool(e, min(settings.DB_POOL_WARM, settings.DB_POOL_SIZE), prepare_statements)
+            except Exception as exc:
+                logger.warning("Could not warm the connection pool of %s: %s", e.url.host, exc)
+
+
+async def refresh_reference(app: FastAPI) -> None:
+    """
+    While the in-memory data is stale, keep trying to reload it from Postgres.
+    Otherwise compare its version with the database every REFERENCE_CHECK_INTERVAL
+    seconds, so a loader run reaches the lookups and the validation cache key
+    (app.state.reference_version) without a restart.
+    """
+    checked_at = time.monotonic()
+    while True:
+        if reference_store.stale or time.monotonic() - checked_at >= settings.REFERENCE_CHECK_INTERVAL:
+            checked_at = time.monotonic()
+            try:
+                async with asyncio.timeout(settings.REFERENCE_LOAD_TIMEOUT):
+                    await load_reference(app)
+            except Exception as exc:
+                if is_unavailable(exc):
+                    reference_store.mark_db_down(exc)
+                logger.warning("Reference data reload failed, still serving the %s copy: %s",
+                               reference_store.source, exc)
+        await asyncio.sleep(settings.REFERENCE_REFRESH_INTERVAL)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Load townships into memory
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(Township).order_by(Township.name))
-        townships = result.scalars().all()
-        app.state.townships_cache = [TownshipOut.model_validate(t) for t in townships]
+    # Latency diagnostics: slow-query log on every engine, event-loop stall detector
+    if settings.SLOW_QUERY_MS > 0:
+        for e in all_engines():
+            install_slow_query_log(e, settings.SLOW_QUERY_MS, explain=settings.SLOW_QUERY_EXPLAIN)
+    stall_monitor = None
+    if settings.LOOP_STALL_THRESHOLD_MS > 0:
+        stall_monitor = LoopStallMonitor(settings.LOOP_STALL_THRESHOLD_MS / 1000)
+        stall_monitor.start()
+    app.state.stall_monitor = stall_monitor
+
+    # Reference data: the last-known-good snapshot if there is one, so startup
+    # does not wait for Postgres; it is reloaded from the database in the background
+    snapshot = read_snapshot()
+    if snapshot is not None:
+        await reference_store.use(snapshot, "snapshot")
+        publish_reference(app)
+        logger.info("Serving reference data from the snapshot (version %s) until the database is reached",
+                    snapshot.version)
+    else:
+        await load_reference(app)
+    reference_refresher = asyncio.create_task(refresh_reference(app))
+
+    # Outcomes of recent /proxy/tracker validations, for client retries
+    app.state.validation_cache = ValidationCache(
+        ttl=settings.VALIDATION_CACHE_TTL,
+        max_entries=settings.VALIDATION_CACHE_MAX_ENTRIES,
+    )
+
+    # Background health checks for read replicas (if configured)
+    replica_monitor = asyncio.create_task(monitor_replicas()) if replicas else None
+
+    # Admission control and circuit breaker for relays to DHIS2
+    app.state.relay_guard = RelayGuard(
+        max_in_flight=settings.RELAY_MAX_IN_FLIGHT,
+        max_queued=settings.RELAY_MAX_QUEUED,
+        queue_timeout=settings.RELAY_QUEUE_TIMEOUT,
+        slow_seconds=settings.BREAKER_SLOW_SECONDS,
+        breaker=CircuitBreaker(settings.BREAKER_FAILURE_THRESHOLD, settings.BREAKER_RESET_SECONDS),
+    )
 
     # Shared async HTTP client for proxying to DHIS2
-    async with httpx.AsyncClient(timeout=60) as client:
+    async with httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.DHIS2_TIMEOUT, connect=settings.DHIS2_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=settings.DHIS2_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.DHIS2_MAX_KEEPALIVE_CONNECTIONS,
+        ),
+    ) as client:
         app.state.http_client = client
         yield
 
+    reference_refresher.cancel()
+    with suppress(asyncio.CancelledError):
+        await reference_refresher
+    if replica_monitor is not None:
+        replica_monitor.cancel()
+        with suppress(asyncio.CancelledError):
+            await replica_monitor
+    if stall_monitor is not None:
+        await stall_monitor.stop()
+    await dispose_engines()
     app.state.townships_cache = []
 
 
 app = FastAPI(title="Village Lookup", lifespan=lifespan)
 
 
-_CACHED_PATHS = {"/townships", "/wards", "/villages"}
+_CACHED_PATHS = {"/townships", "/wards", "/villages", "/address/search"}
 
 
 @app.middleware("http")
 async def add_cache_headers(request: Request, call_next):
     response = await call_next(request)
     if request.url.path in _CACHED_PATHS:
-        response.headers["Cache-Control"] = "private, max-age=3600"
+        # Don't let clients hold on to answers from a stale copy for an hour
+        max_age = 60 if reference_store.stale else 3600
+        response.headers["Cache-Control"] = f"private, max-age={max_age}"
+    if reference_store.stale:
+        response.headers["X-Reference-Data"] = reference_store.staleness()
+    return response
+
+
+# Server-Timing: stage breakdown for the proxy, validation and lookup routes
+_TIMED_PATHS = {"/proxy/tracker", "/validate", "/wards", "/villages", "/address/search", "/icd10"}
+_LOOKUP_PATHS = {"/wards", "/villages", "/address/search", "/icd10"}
+
+
+@app.middleware("http")
+async def add_server_timing(request: Request, call_next):
+    path = request.url.path
+    if path not in _TIMED_PATHS:
+        return await call_next(request)
+
+    timings = Timings()
+    token = current_timings.set(timings)
+    try:
+        response = await call_next(request)
+    finally:
+        current_timings.reset(token)
+
+    now = time.perf_counter()
+    if path == "/validate" and timings.first_stage_start is not None:
+        # FastAPI reads and validates the body before the handler runs
+        timings.stages = {"parse": timings.first_stage_start - timings.started, **timings.stages}
+    if path in _LOOKUP_PATHS and timings.last_stage_end is not None:
+        # Building and serialising the response after the last query
+        timings.stages["serialize"] = now - timings.last_stage_end
+    response.headers["Server-Timing"] = timings.header()
     return response
 
 
+@app.middleware("http")
+async def profile_on_request(request: Request, call_next):
+    if wants_profile(request):
+        return await profile_request(request, call_next)
+    return await call_next(request)
+
+
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
+    return {
+        "status": "degraded" if reference_store.db_down else "ok",
+        "reference_data": reference_store.status(),
+    }
+
+
+@app.get("/metrics")
+async def metrics(request: Request):
+    return {
+        "db_pools": pool_metrics(),
+        "relay": request.app.state.relay_guard.stats(),
+        "reference_data": reference_store.status(),
+        "loop_stalls": request.app.state.stall_monitor.stalls if request.app.state.stall_monitor else None,
+    }
 
 
 app.include_router(villages_router)
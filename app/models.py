@@ -25,6 +25,7 @@ class Ward(Base):
     code: Mapped[str | None] = mapped_column(String(255))
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     name_my: Mapped[str | None] = mapped_column(String(255))
+    name_my_norm: Mapped[str | None] = mapped_column(String(255))   # normalize_my(name_my), for search
     township_id: Mapped[int] = mapped_column(Integer, ForeignKey("townships.id"), nullable=False)
 
     township: Mapped["Township"] = relationship("Township", back_populates="wards")
@@ -38,6 +39,7 @@ class Village(Base):
     code: Mapped[str | None] = mapped_column(String(255))
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     name_my: Mapped[str | None] = mapped_column(String(255))
+    name_my_norm: Mapped[str | None] = mapped_column(String(255))   # normalize_my(name_my), for search
     township_id: Mapped[int] = mapped_column(Integer, ForeignKey("townships.id"), nullable=False)
 
     township: Mapped["Township"] = relationship("Township", back_populates="villages")
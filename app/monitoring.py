@@ -0,0 +1,126 @@
+"""
+Diagnostics for latency regressions: an event-loop stall detector and a
+slow-query log.
+
+Everything runs on one asyncio loop per worker, so synchronous work on the
+request path (a big json decode, building hundreds of models) blocks every
+other request. The stall monitor notices and logs where the loop was stuck.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+
+class LoopStallMonitor:
+    """
+    A task on the loop bumps a heartbeat every `interval`; a watchdog thread logs
+    the loop thread's stack once per stall whenever the heartbeat is older than
+    `threshold`.
+    """
+
+    def __init__(self, threshold: float, interval: float = 0.05):
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls = 0
+        self._beat = time.monotonic()
+        self._loop_thread_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self) -> None:
+        reported_beat = None
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            blocked = time.monotonic() - beat
+            if blocked < self.threshold or beat == reported_beat:
+                continue
+            reported_beat = beat
+            self.stalls += 1
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "(no frame)\n"
+            logger.warning("Event loop blocked for over %.0f ms, loop thread stack:\n%s", blocked * 1000, stack)
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-stall-monitor", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+EXPLAIN_TIMEOUT_MS = 30_000
+
+
+def install_slow_query_log(engine: AsyncEngine, threshold_ms: float, explain: bool = False) -> None:
+    """
+    Log statements slower than `threshold_ms` with their parameters. With `explain`,
+    a slow SELECT is re-run under EXPLAIN (ANALYZE, BUFFERS) in the background, on a
+    connection of its own, and the plan is logged once it is in. The request that
+    ran the query neither waits for it nor sees it fail; one EXPLAIN runs at a time
+    per engine, so a burst of slow queries doesn't double the database load.
+    """
+    sync_engine = engine.sync_engine
+    explaining: set[asyncio.Task] = set()
+
+    async def _explain(statement: str, parameters) -> None:
+        try:
+            async with engine.connect() as conn:
+                conn = await conn.execution_options(slow_query_log=False)
+                await conn.exec_driver_sql(f"SET LOCAL statement_timeout = {EXPLAIN_TIMEOUT_MS}")
+                result = await conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+                plan = "\n".join(row[0] for row in result)
+        except Exception as exc:
+            plan = f"(EXPLAIN failed: {exc})"
+        logger.warning("Plan of the slow query on %s: %s\n%s", engine.url.host, " ".join(statement.split()), plan)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _drop_timer(context):
+        # A failed statement never reaches after_cursor_execute. Errors outside
+        # execution (connecting, pre-ping, fetching) have no statement and no timer.
+        if context.statement is not None and context.connection is not None:
+            started = context.connection.info.get("query_started")
+            if started:
+                started.pop()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _log_slow(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_started"].pop()) * 1000
+        if elapsed_ms < threshold_ms or not context.execution_options.get("slow_query_log", True):
+            return
+
+        logger.warning(
+            "Slow query on %s (%.0f ms): %s\nparameters: %r",
+            engine.url.host, elapsed_ms, " ".join(statement.split()), parameters,
+        )
+        if explain and not explaining and not executemany and statement.lstrip().upper().startswith("SELECT"):
+            # Listeners run in the loop thread (SQLAlchemy's asyncio greenlet bridge)
+            task = asyncio.get_running_loop().create_task(_explain(statement, parameters))
+            explaining.add(task)
+            task.add_done_callback(explaining.discard)
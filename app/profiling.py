@@ -0,0 +1,46 @@
+"""
+Opt-in sampling profile of a single request.
+
+A request carrying `X-Profile: <PROFILE_TOKEN>` is run under pyinstrument and,
+instead of its normal response, returns the profile as a downloadable HTML
+report. Disabled while PROFILE_TOKEN is empty.
+"""
+import hmac
+import time
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.config import settings
+
+PROFILE_HEADER = "X-Profile"
+
+
+def wants_profile(request: Request) -> bool:
+    supplied = request.headers.get(PROFILE_HEADER)
+    if not settings.PROFILE_TOKEN or supplied is None:
+        return False
+    return hmac.compare_digest(supplied.encode(), settings.PROFILE_TOKEN.encode())
+
+
+async def profile_request(request: Request, call_next) -> Response:
+    from pyinstrument import Profiler
+
+    profiler = Profiler(interval=settings.PROFILE_INTERVAL, async_mode="enabled")
+    profiler.start()
+    try:
+        response = await call_next(request)
+        async for _ in response.body_iterator:   # run streaming bodies to completion too
+            pass
+    finally:
+        profiler.stop()
+
+    filename = f"profile-{request.url.path.strip('/').replace('/', '-') or 'root'}-{int(time.time())}.html"
+    return Response(
+        content=profiler.output_html(),
+        media_type="text/html",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Profiled-Status": str(response.status_code),
+        },
+    )
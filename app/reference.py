@@ -0,0 +1,382 @@
+"""
+In-memory copy of the reference data: townships, wards, villages and ICD10 codes.
+
+Loaded from Postgres and written to a last-known-good snapshot file; on the
+next start the snapshot is served straight away and the database copy is
+reloaded in the background, so a restart does not depend on Postgres being up.
+
+Held as a compact column store (app.reference_tables). Used for:
+  - /townships and /icd10/browse, always
+  - suggestions of the nearest valid wards/villages in validation errors
+  - the lookups and validation checks while Postgres is unreachable
+"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, NamedTuple, TypeVar
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.burmese import is_myanmar, normalize_my
+from app.config import settings
+from app.database import is_unavailable
+from app.icd10_tree import ICD10Tree
+from app.reference_tables import ICD10Table, ICD10View, PlaceTable, PlaceView, TrigramIndex
+from app.routers.validate import Suggestion
+from app.schemas import TownshipOut
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[^\W_]+")
+
+SNAPSHOT_FORMAT = 1
+
+
+class TownshipRow(NamedTuple):
+    uid: str
+    code: str | None
+    name: str
+    name_my: str | None
+
+
+class PlaceRow(NamedTuple):
+    """A ward or village."""
+    township_uid: str
+    township_code: str | None
+    uid: str
+    code: str | None
+    name: str
+    name_my: str | None
+    name_my_norm: str | None
+
+
+class ICD10Row(NamedTuple):
+    uid: str
+    code: str | None
+    icd_code: str | None
+    name: str
+
+
+def trigrams(s: str) -> set[str]:
+    """Trigrams the way pg_trgm builds them: per lower-cased word, padded with two spaces in front, one behind."""
+    grams: set[str] = set()
+    for word in _WORD.findall(s.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a: set[str], b: set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+async def reference_version(db: AsyncSession) -> str:
+    """
+    Fingerprint of the reference data: every column ReferenceData holds, of every
+    row. Changes whenever the loader adds, removes, renames or recodes a township,
+    ward, village or ICD10 code.
+    """
+    row = await db.execute(
+        text(
+            """
+            SELECT md5(
+                (SELECT coalesce(string_agg(row(id, uid, code, name, name_my)::text, ',' ORDER BY id), '')
+                 FROM   townships)
+                || '|' ||
+                (SELECT coalesce(string_agg(row(township_id, uid, code, name, name_my, name_my_norm)::text, ','
+                                            ORDER BY id), '')
+                 FROM   wards)
+                || '|' ||
+                (SELECT coalesce(string_agg(row(township_id, uid, code, name, name_my, name_my_norm)::text, ','
+                                            ORDER BY id), '')
+                 FROM   villages)
+                || '|' ||
+                (SELECT coalesce(string_agg(row(uid, code, icd_code, name)::text, ',' ORDER BY id), '')
+                 FROM   icd10_codes)
+            )
+            """
+        )
+    )
+    return row.scalar_one()
+
+
+@dataclass
+class ReferenceData:
+    version: str            # reference_version() at load time
+    loaded_at: float        # unix time the rows were read from Postgres
+    townships: list[TownshipRow]
+    wards: list[PlaceRow]
+    villages: list[PlaceRow]
+    icd10: list[ICD10Row]
+
+    @classmethod
+    async def from_db(cls, db: AsyncSession) -> "ReferenceData":
+        loaded_at = time.time()
+        # Row order is the order the lookups return them in when there is no search term
+        townships = await db.execute(text("SELECT uid, code, name, name_my FROM townships ORDER BY name"))
+        places = {}
+        for table in ("wards", "villages"):
+            rows = await db.execute(text(
+                f"""
+                SELECT t.uid AS township_uid, t.code AS township_code,
+                       x.uid, x.code, x.name, x.name_my, x.name_my_norm
+                FROM   {table} x
+                JOIN   townships t ON t.id = x.township_id
+                ORDER  BY t.uid, x.name
+                """
+            ))
+            places[table] = [PlaceRow(*r) for r in rows]
+        icd10 = await db.execute(text("SELECT uid, code, icd_code, name FROM icd10_codes ORDER BY icd_code, name"))
+        return cls(
+            version=await reference_version(db),
+            loaded_at=loaded_at,
+            townships=[TownshipRow(*r) for r in townships],
+            wards=places["wards"],
+            villages=places["villages"],
+            icd10=[ICD10Row(*r) for r in icd10],
+        )
+
+    @classmethod
+    def read(cls, path: Path) -> "ReferenceData":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            doc = json.load(f)
+        if doc.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"unsupported snapshot format {doc.get('format')!r}")
+        return cls(
+            version=doc["version"],
+            loaded_at=doc["loaded_at"],
+            townships=[TownshipRow(*r) for r in doc["townships"]],
+            wards=[PlaceRow(*r) for r in doc["wards"]],
+            villages=[PlaceRow(*r) for r in doc["villages"]],
+            icd10=[ICD10Row(*r) for r in doc["icd10"]],
+        )
+
+    def write(self, path: Path) -> None:
+        """Write atomically, so a crash (or another worker) never leaves a half-written snapshot."""
+        doc = {
+            "format": SNAPSHOT_FORMAT,
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "townships": self.townships,
+            "wards": self.wards,
+            "villages": self.villages,
+            "icd10": self.icd10,
+        }
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(doc, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+
+
+def _search(table: PlaceTable, rows: range, q: str | None, limit: int) -> list[tuple[float, int]]:
+    """(score, row) the way the lookup queries pick them: ILIKE match, ranked by similarity."""
+    if not q:
+        return [(0.0, row) for row in rows[:limit]]
+    burmese = is_myanmar(q)
+    term = normalize_my(q) if burmese else q
+    column, folded = (table.name_my_norm, table.name_my_norm_folded) if burmese else (table.name, table.name_folded)
+    wanted = trigrams(term)
+    hits = [(similarity(wanted, trigrams(column[row])), row) for row in folded.find_rows(term.casefold(), rows)]
+    hits.sort(key=lambda h: h[0], reverse=True)
+    return hits[:limit]
+
+
+def _suggestion_index(table: PlaceTable) -> tuple[TrigramIndex, TrigramIndex]:
+    """Trigram indexes over the codes and the names of the places suggest() may offer (those with a code)."""
+    rows = [row for row in range(len(table)) if not table.code.nulls[row]]
+    return TrigramIndex(table.code, rows, trigrams), TrigramIndex(table.name, rows, trigrams)
+
+
+class _Tables(NamedTuple):
+    """What a ReferenceStore serves, built from one ReferenceData."""
+    townships: list[TownshipOut]
+    township_names: dict[str, str]
+    places: dict[str, PlaceTable]
+    suggestion_index: dict[str, tuple[TrigramIndex, TrigramIndex]]
+    icd10: ICD10Table
+    icd10_tree: ICD10Tree
+    memory: dict[str, int]
+
+
+def _footprint(
+    places: dict[str, PlaceTable],
+    suggestion_index: dict[str, tuple[TrigramIndex, TrigramIndex]],
+    icd10: ICD10Table,
+    icd10_tree: ICD10Tree,
+) -> dict[str, int]:
+    """Approximate bytes held per table, its indexes included. Walks every column and index."""
+    sizes = {
+        "wards": places["ward"].nbytes + sum(index.nbytes for index in suggestion_index["ward"]),
+        "villages": places["village"].nbytes + sum(index.nbytes for index in suggestion_index["village"]),
+        "icd10": icd10.nbytes,
+        "icd10_tree": icd10_tree.nbytes,
+    }
+    sizes["total"] = sum(sizes.values())
+    return sizes
+
+
+def _build_tables(data: ReferenceData) -> _Tables:
+    places = {"ward": PlaceTable(data.wards), "village": PlaceTable(data.villages)}
+    suggestion_index = {kind: _suggestion_index(table) for kind, table in places.items()}
+    icd10 = ICD10Table(data.icd10)
+    icd10_tree = ICD10Tree.build(icd10)
+    return _Tables(
+        townships=[TownshipOut.model_validate(t._asdict()) for t in data.townships],
+        township_names={t.uid: t.name for t in data.townships},
+        places=places,
+        suggestion_index=suggestion_index,
+        icd10=icd10,
+        icd10_tree=icd10_tree,
+        memory=_footprint(places, suggestion_index, icd10, icd10_tree),
+    )
+
+
+class ReferenceStore:
+    def __init__(self):
+        self.version: str | None = None
+        self.loaded_at: float | None = None   # last time the data was known to match Postgres
+        self.source: str | None = None        # "database" | "snapshot"
+        self.db_down = False                  # Postgres unreachable — lookups and checks answered from here
+        self.townships: list[TownshipOut] = []
+        self._township_names: dict[str, str] = {}
+        self._places = {"ward": PlaceTable([]), "village": PlaceTable([])}
+        self._suggestion_index = {kind: _suggestion_index(table) for kind, table in self._places.items()}
+        self._icd10 = ICD10Table([])
+        self.icd10_tree = ICD10Tree.build(self._icd10)
+        self._memory = _footprint(self._places, self._suggestion_index, self._icd10, self.icd10_tree)
+
+    async def use(self, data: ReferenceData, source: str) -> None:
+        """
+        Serve `data` from now on; the row lists are not kept. The column store is
+        built in a worker thread, so requests are answered from the current one
+        meanwhile, and swapped in on the event loop.
+        """
+        tables = await asyncio.to_thread(_build_tables, data)
+
+        self.townships, self._township_names = tables.townships, tables.township_names
+        self._places, self._suggestion_index = tables.places, tables.suggestion_index
+        self._icd10, self.icd10_tree = tables.icd10, tables.icd10_tree
+        self._memory = tables.memory
+        self.version, self.loaded_at, self.source = data.version, data.loaded_at, source
+        if source == "database":
+            self.db_down = False
+        logger.info("Reference data in memory: %s", ", ".join(f"{k} {v / 1e6:.1f} MB" for k, v in self.memory().items()))
+
+    def confirm(self) -> None:
+        """Postgres holds the same version as memory: the data is current again without a reload."""
+        self.loaded_at, self.source, self.db_down = time.time(), "database", False
+
+    def memory(self) -> dict[str, int]:
+        """Approximate bytes held per table, its indexes included; measured when the data was loaded."""
+        return dict(self._memory)
+
+    # ── Degraded mode ────────────────────────────────────────────────────────
+
+    @property
+    def stale(self) -> bool:
+        """Answers may lag the database: served from the snapshot, or Postgres is down."""
+        return self.source == "snapshot" or self.db_down
+
+    def mark_db_down(self, exc: BaseException) -> None:
+        if not self.db_down:
+            logger.warning("Postgres is unreachable, serving reference data from memory: %s", exc)
+        self.db_down = True
+
+    def status(self) -> dict:
+        loaded = self.loaded_at is not None
+        return {
+            "source": self.source,
+            "version": self.version,
+            "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.loaded_at)) if loaded else None,
+            "age_seconds": int(time.time() - self.loaded_at) if loaded else None,
+            "database": "down" if self.db_down else "up",
+            "stale": self.stale,
+            "memory_bytes": self.memory(),
+        }
+
+    def staleness(self) -> str:
+        """Value of the X-Reference-Data response header."""
+        age = int(time.time() - self.loaded_at) if self.loaded_at is not None else None
+        return f"stale; source={self.source}; age={age}"
+
+    # ── Lookups and checks ───────────────────────────────────────────────────
+
+    def has(self, kind: str, key: tuple[str, ...]) -> bool:
+        if kind == "icd10":
+            return self._icd10.has(*key)
+        return self._places[kind].has(*key)
+
+    def existing(self, kind: str, keys: set[tuple[str, ...]]) -> set[tuple[str, ...]]:
+        return {key for key in keys if self.has(kind, key)}
+
+    def search_places(self, kind: str, township_uid: str, q: str | None, limit: int) -> list[PlaceView]:
+        table = self._places[kind]
+        return [table.view(row) for _, row in _search(table, table.rows(township_uid), q, limit)]
+
+    def search_address(self, township_uid: str, q: str, limit: int) -> list[dict]:
+        township_name = self._township_names.get(township_uid)
+        hits = []
+        for kind, table in self._places.items():
+            hits.extend((score, kind, table.view(row)) for score, row in _search(table, table.rows(township_uid), q, limit))
+        hits.sort(key=lambda h: (-h[0], h[2].name))
+        return [
+            {"type": kind, "uid": p.uid, "code": p.code, "name": p.name, "name_my": p.name_my,
+             "township_uid": township_uid, "township_name": township_name}
+            for _, kind, p in hits[:limit]
+        ]
+
+    def search_icd10(self, q: str | None, offset: int, limit: int, by_code: bool) -> tuple[int, list[ICD10View]]:
+        """(total matches, one page of them); rows are kept in icd_code order."""
+        table = self._icd10
+        rows: range | list[int] = range(len(table))
+        if q:
+            rows = list(table.name_folded.find_rows(q.casefold(), rows))
+            if not by_code:
+                wanted = trigrams(q)
+                rows.sort(key=lambda row: similarity(wanted, trigrams(table.name[row])), reverse=True)
+        return len(rows), [table.view(row) for row in rows[offset:offset + limit]]
+
+    def suggest(self, kind: str, township_code: str, value: str, k: int | None = None) -> list[Suggestion]:
+        """Top-k places of the township most similar to `value` by code or name."""
+        k = k or settings.SUGGESTION_COUNT
+        table = self._places[kind]
+        codes, names = self._suggestion_index[kind]
+        rows = table.rows_by_code(township_code)
+        wanted = trigrams(value)
+
+        scores = codes.similar(wanted, rows)
+        for row, score in names.similar(wanted, rows).items():
+            if score > scores.get(row, 0.0):
+                scores[row] = score
+        best = sorted(scores, key=lambda row: (-scores[row], row))[:k]
+        return [Suggestion(code=p.code, name=p.name, name_my=p.name_my) for p in map(table.view, best)]
+
+
+reference_store = ReferenceStore()
+
+T = TypeVar("T")
+
+
+async def from_db_or_memory(db_call: Callable[[], Awaitable[T]], memory_call: Callable[[], T]) -> T:
+    """
+    Answer with `db_call`, or with `memory_call` while Postgres is unreachable.
+    Only connection failures switch over — a bad query still raises.
+    """
+    if not reference_store.db_down:
+        try:
+            return await db_call()
+        except Exception as exc:
+            if not is_unavailable(exc):
+                raise
+            reference_store.mark_db_down(exc)
+    return memory_call()
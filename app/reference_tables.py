@@ -0,0 +1,250 @@
+"""
+Compact column store for the in-memory reference data.
+
+Each text column is packed into one str with an offset array, rather than
+one Python object per value: ~1 byte per character (2 for Burmese) plus 4
+per row, instead of ~50 bytes of object header per string and a tuple per
+row. Rows are grouped per township, so a township's wards or villages are a
+contiguous row range, and name searches run as str.find over that slice of
+the packed column.
+
+Callers read rows through views (PlaceView, ICD10View), which hold only
+their table and row number; a value is sliced out of its column when an
+attribute is read. Similarity searches go through a TrigramIndex.
+"""
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+_SEP = "\0"     # between values in a packed column; never part of a value
+
+
+class StringColumn:
+    """Row i is text[starts[i]:starts[i + 1] - 1]; NULLs are stored as "" and flagged in `nulls`."""
+    __slots__ = ("text", "starts", "nulls")
+
+    def __init__(self, values: list[str | None]):
+        self.text = _SEP.join(v or "" for v in values) + _SEP
+        self.starts = array("I", [0])
+        pos = 0
+        for v in values:
+            pos += len(v or "") + 1
+            self.starts.append(pos)
+        self.nulls = bytes(v is None for v in values)
+
+    def __len__(self) -> int:
+        return len(self.nulls)
+
+    def __getitem__(self, row: int) -> str | None:
+        if self.nulls[row]:
+            return None
+        return self.text[self.starts[row]:self.starts[row + 1] - 1]
+
+    def folded(self) -> "StringColumn":
+        """The column casefolded, for case-insensitive search — itself if folding changes nothing."""
+        folded = self.text.casefold()
+        if folded == self.text:
+            return self
+        column = StringColumn([])
+        column.text = folded
+        column.starts = array("I", [0])
+        pos = 0
+        for row in range(len(self)):
+            pos += len(self.text[self.starts[row]:self.starts[row + 1]].casefold())
+            column.starts.append(pos)
+        column.nulls = self.nulls
+        return column
+
+    def find_rows(self, needle: str, rows: range) -> Iterator[int]:
+        """Rows within `rows` whose (non-NULL) value contains `needle`, in row order."""
+        if not needle:
+            yield from (row for row in rows if not self.nulls[row])
+            return
+        if _SEP in needle or not rows:
+            return
+        starts, end = self.starts, self.starts[rows.stop]
+        pos = self.text.find(needle, starts[rows.start], end)
+        while pos != -1:
+            row = bisect_right(starts, pos, rows.start, rows.stop + 1) - 1
+            yield row
+            pos = self.text.find(needle, starts[row + 1], end)
+
+    @property
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.text) + sys.getsizeof(self.starts) + sys.getsizeof(self.nulls)
+
+
+class TrigramIndex:
+    """
+    Inverted trigram index over a StringColumn: trigram → the rows whose value
+    has it (ascending), plus each row's trigram count. That is enough to score
+    a query against every row sharing a trigram with it, reading only those
+    rows' postings instead of re-deriving each value's trigrams.
+    """
+    __slots__ = ("postings", "counts")
+
+    def __init__(self, column: StringColumn, rows: Iterable[int], grams: Callable[[str], set[str]]):
+        """Index `rows` of `column` (in ascending order); `grams` splits a value into trigrams."""
+        self.postings: dict[str, array] = {}
+        self.counts = array("H", bytes(2 * len(column)))
+        for row in rows:
+            row_grams = grams(column[row] or "")
+            self.counts[row] = len(row_grams)
+            for gram in row_grams:
+                posting = self.postings.get(gram)
+                if posting is None:
+                    posting = self.postings[gram] = array("I")
+                posting.append(row)
+
+    def similar(self, wanted: set[str], rows: range) -> dict[int, float]:
+        """Rows within `rows` sharing a trigram with `wanted` → their similarity to it (as pg_trgm's)."""
+        shared: dict[int, int] = {}
+        for gram in wanted:
+            posting = self.postings.get(gram)
+            if posting is None:
+                continue
+            for row in posting[bisect_left(posting, rows.start):bisect_left(posting, rows.stop)]:
+                shared[row] = shared.get(row, 0) + 1
+        n = len(wanted)
+        return {row: count / (n + self.counts[row] - count) for row, count in shared.items()}
+
+    @property
+    def nbytes(self) -> int:
+        return (sys.getsizeof(self.postings) + sys.getsizeof(self.counts)
+                + sum(sys.getsizeof(gram) + sys.getsizeof(posting) for gram, posting in self.postings.items()))
+
+
+class _Field:
+    """Attribute of a view that reads the same-named column of its table."""
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, view, owner=None):
+        if view is None:
+            return self
+        return getattr(view.table, self.name)[view.row]
+
+
+class PlaceView:
+    """A ward or village — a window onto one row of a PlaceTable."""
+    __slots__ = ("table", "row")
+
+    uid = _Field()
+    code = _Field()
+    name = _Field()
+    name_my = _Field()
+    name_my_norm = _Field()
+
+    def __init__(self, table: "PlaceTable", row: int):
+        self.table = table
+        self.row = row
+
+
+class ICD10View:
+    """An ICD10 option — a window onto one row of an ICD10Table."""
+    __slots__ = ("table", "row")
+
+    uid = _Field()
+    code = _Field()
+    icd_code = _Field()
+    name = _Field()
+
+    def __init__(self, table: "ICD10Table", row: int):
+        self.table = table
+        self.row = row
+
+
+def _code_order(codes: StringColumn, segments) -> array:
+    """Row numbers with each segment (range) sorted by code, NULL codes last — for bisect lookups."""
+    order = array("I")
+    for rows in segments:
+        order.extend(sorted(rows, key=lambda row: (bool(codes.nulls[row]), codes[row] or "")))
+    return order
+
+
+class PlaceTable:
+    """Wards or villages, grouped per township, keeping the given order within a township."""
+
+    def __init__(self, rows: list[NamedTuple]):
+        """`rows` have township_uid, township_code, uid, code, name, name_my and name_my_norm."""
+        rows = sorted(rows, key=lambda r: r.township_uid)   # stable: keeps the name order within a township
+        self.uid = StringColumn([r.uid for r in rows])
+        self.code = StringColumn([r.code for r in rows])
+        self.name = StringColumn([r.name for r in rows])
+        self.name_my = StringColumn([r.name_my for r in rows])
+        self.name_my_norm = StringColumn([r.name_my_norm for r in rows])
+        self.name_folded = self.name.folded()
+        self.name_my_norm_folded = self.name_my_norm.folded()
+
+        # township_uid / township_code → its row range
+        self.by_township: dict[str, range] = {}
+        self.by_township_code: dict[str, range] = {}
+        start = 0
+        for row in range(1, len(rows) + 1):
+            if row == len(rows) or rows[row].township_uid != rows[start].township_uid:
+                township = rows[start]
+                self.by_township[township.township_uid] = range(start, row)
+                if township.township_code is not None:
+                    self.by_township_code[township.township_code] = range(start, row)
+                start = row
+        self.code_order = _code_order(self.code, self.by_township.values())
+
+    def __len__(self) -> int:
+        return len(self.uid)
+
+    def rows(self, township_uid: str) -> range:
+        return self.by_township.get(township_uid, range(0))
+
+    def rows_by_code(self, township_code: str) -> range:
+        return self.by_township_code.get(township_code, range(0))
+
+    def view(self, row: int) -> PlaceView:
+        return PlaceView(self, row)
+
+    def has(self, township_code: str, code: str) -> bool:
+        if code is None:
+            return False
+        rows = self.rows_by_code(township_code)
+        i = bisect_left(self.code_order, (False, code), rows.start, rows.stop,
+                        key=lambda row: (bool(self.code.nulls[row]), self.code[row] or ""))
+        return i < rows.stop and self.code[self.code_order[i]] == code
+
+    @property
+    def nbytes(self) -> int:
+        columns = {id(c): c for c in (self.uid, self.code, self.name, self.name_my, self.name_my_norm,
+                                      self.name_folded, self.name_my_norm_folded)}
+        return (sum(c.nbytes for c in columns.values()) + sys.getsizeof(self.code_order)
+                + sys.getsizeof(self.by_township) + sys.getsizeof(self.by_township_code))
+
+
+class ICD10Table:
+    """ICD10 options in the given (icd_code) order."""
+
+    def __init__(self, rows: list[NamedTuple]):
+        """`rows` have uid, code, icd_code and name."""
+        self.uid = StringColumn([r.uid for r in rows])
+        self.code = StringColumn([r.code for r in rows])
+        self.icd_code = StringColumn([r.icd_code for r in rows])
+        self.name = StringColumn([r.name for r in rows])
+        self.name_folded = self.name.folded()
+        self.code_order = _code_order(self.code, [range(len(rows))])
+
+    def __len__(self) -> int:
+        return len(self.uid)
+
+    def view(self, row: int) -> ICD10View:
+        return ICD10View(self, row)
+
+    def has(self, code: str) -> bool:
+        if code is None:
+            return False
+        i = bisect_left(self.code_order, (False, code),
+                        key=lambda row: (bool(self.code.nulls[row]), self.code[row] or ""))
+        return i < len(self.code_order) and self.code[self.code_order[i]] == code
+
+    @property
+    def nbytes(self) -> int:
+        columns = {id(c): c for c in (self.uid, self.code, self.icd_code, self.name, self.name_folded)}
+        return sum(c.nbytes for c in columns.values()) + sys.getsizeof(self.code_order)
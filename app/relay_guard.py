@@ -0,0 +1,149 @@
+"""
+Admission control for relays to DHIS2.
+
+A bounded number of relays run at once; a bounded number more may wait for a
+slot, and everything beyond that is shed with a fast 503. A circuit breaker
+opens after sustained DHIS2 errors or slow responses and sheds all relays
+until a probe succeeds, so a struggling DHIS2 can't pile up in-flight requests
+(and memory and sockets) in this service.
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class RelayRejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def retry_after(self) -> int:
+        return max(1, int(self.opened_at + self.reset_seconds - time.monotonic()) + 1)
+
+    def allow(self) -> bool:
+        """Whether a relay may be attempted now. In half-open state only one probe runs at a time."""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def abandon(self) -> None:
+        """A relay ended without an outcome (e.g. the client went away) — free the probe slot."""
+        self._probing = False
+
+    def record(self, ok: bool) -> None:
+        self._probing = False
+        if ok:
+            if self.state != CLOSED:
+                logger.info("DHIS2 circuit breaker closed")
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            return
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                logger.warning("DHIS2 circuit breaker opened after %d failed/slow relays", self.consecutive_failures)
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+
+class RelayGuard:
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_queued: int,
+        queue_timeout: float,
+        slow_seconds: float,
+        breaker: CircuitBreaker,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.slow_seconds = slow_seconds
+        self.breaker = breaker
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.queued = 0
+        self.shed = 0
+
+    def check(self) -> None:
+        """Shed early (before any validation work) while the breaker is open."""
+        if self.breaker.state == OPEN and time.monotonic() - self.breaker.opened_at < self.breaker.reset_seconds:
+            self.shed += 1
+            raise RelayRejected("DHIS2 is unavailable (circuit open)", self.breaker.retry_after())
+
+    @asynccontextmanager
+    async def admit(self, max_wait: float | None = None):
+        """
+        Hold a relay slot for the duration of the block, or raise RelayRejected.
+        The block reports the relay's outcome with record() (or abandon()).
+        """
+        if self._slots.locked():
+            if self.queued >= self.max_queued:
+                self.shed += 1
+                raise RelayRejected("Too many submissions in progress", 5)
+            self.queued += 1
+            try:
+                wait = self.queue_timeout if max_wait is None else min(self.queue_timeout, max_wait)
+                await asyncio.wait_for(self._slots.acquire(), wait)
+            except asyncio.TimeoutError:
+                self.shed += 1
+                raise RelayRejected("Too many submissions in progress", 5) from None
+            finally:
+                self.queued -= 1
+        else:
+            await self._slots.acquire()
+
+        try:
+            if not self.breaker.allow():
+                self.shed += 1
+                raise RelayRejected("DHIS2 is unavailable (circuit open)", self.breaker.retry_after())
+            self.in_flight += 1
+            try:
+                yield
+            except BaseException:
+                self.breaker.abandon()
+                raise
+            finally:
+                self.in_flight -= 1
+        finally:
+            self._slots.release()
+
+    def record(self, ok: bool, elapsed: float) -> None:
+        self.breaker.record(ok and elapsed < self.slow_seconds)
+
+    def abandon(self) -> None:
+        """The relay ended for reasons that say nothing about DHIS2's health."""
+        self.breaker.abandon()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "shed": self.shed,
+            "breaker": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+        }
@@ -1,11 +1,15 @@
 import re
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
-from app.schemas import ICD10Out, ICD10Page
+from app.config import settings
+from app.database import fetch_json_array, get_read_db
+from app.reference import from_db_or_memory, reference_store
+from app.schemas import ICD10NodeOut, ICD10Out, ICD10Page
+from app.timing import stage
 
 router = APIRouter()
 
@@ -19,49 +23,77 @@ async def search_icd10(
     q: str | None = Query(None, min_length=3, max_length=100, description="Search term (code or description)"),
     page: int = Query(1, ge=1),
     limit: int = Query(50, ge=1, le=200),
-    db: AsyncSession = Depends(get_db),
-) -> ICD10Page:
+    db: AsyncSession = Depends(get_read_db),
+) -> ICD10Page | Response:
+    offset = (page - 1) * limit
+
+    def from_memory() -> ICD10Page:
+        total, rows = reference_store.search_icd10(q, offset, limit, by_code=bool(q and _CODE_PATTERN.match(q)))
+        results = [ICD10Out(uid=r.uid, code=r.code, icd_code=r.icd_code, name=r.name) for r in rows]
+        return ICD10Page(page=page, limit=limit, total=total, results=results)
+
+    return await from_db_or_memory(lambda: query_icd10(db, q, page, limit), from_memory)
+
+
+async def query_icd10(db: AsyncSession, q: str | None, page: int, limit: int) -> ICD10Page | Response:
     offset = (page - 1) * limit
 
     if q:
-        count_row = await db.execute(
-            text("SELECT COUNT(*) FROM icd10_codes WHERE name ILIKE '%' || :q || '%'"),
-            {"q": q},
-        )
+        with stage("db"):
+            count_row = await db.execute(
+                text("SELECT COUNT(*) FROM icd10_codes WHERE name ILIKE '%' || :q || '%'"),
+                {"q": q},
+            )
         total = count_row.scalar() or 0
 
         order = "icd_code" if _CODE_PATTERN.match(q) else "similarity(name, :q) DESC, icd_code"
 
-        rows = await db.execute(
-            text(
-                f"""
-                SELECT uid, code, icd_code, name
-                FROM   icd10_codes
-                WHERE  name ILIKE '%' || :q || '%'
-                ORDER  BY {order}
-                LIMIT  :limit OFFSET :offset
-                """
-            ),
-            {"q": q, "limit": limit, "offset": offset},
-        )
+        query = f"""
+            SELECT uid, code, icd_code, name
+            FROM   icd10_codes
+            WHERE  name ILIKE '%' || :q || '%'
+            ORDER  BY {order}
+            LIMIT  :limit OFFSET :offset
+            """
+        params = {"q": q, "limit": limit, "offset": offset}
     else:
-        count_row = await db.execute(text("SELECT COUNT(*) FROM icd10_codes"))
+        with stage("db"):
+            count_row = await db.execute(text("SELECT COUNT(*) FROM icd10_codes"))
         total = count_row.scalar() or 0
 
-        rows = await db.execute(
-            text(
-                """
-                SELECT uid, code, icd_code, name
-                FROM   icd10_codes
-                ORDER  BY icd_code, name
-                LIMIT  :limit OFFSET :offset
-                """
-            ),
-            {"limit": limit, "offset": offset},
+        query = """
+            SELECT uid, code, icd_code, name
+            FROM   icd10_codes
+            ORDER  BY icd_code, name
+            LIMIT  :limit OFFSET :offset
+            """
+        params = {"limit": limit, "offset": offset}
+
+    if settings.DB_RENDERED_JSON:
+        with stage("db"):
+            results_json = await fetch_json_array(db, query, params)
+        return Response(
+            f'{{"page":{page},"limit":{limit},"total":{total},"results":{results_json}}}',
+            media_type="application/json",
         )
 
+    with stage("db"):
+        rows = await db.execute(text(query), params)
     results = [
         ICD10Out(uid=r.uid, code=r.code, icd_code=r.icd_code, name=r.name)
         for r in rows.mappings()
     ]
     return ICD10Page(page=page, limit=limit, total=total, results=results)
+
+
+@router.get("/icd10/browse", response_model=list[ICD10NodeOut])
+async def browse_icd10_chapters(request: Request):
+    return request.app.state.icd10_tree.children()
+
+
+@router.get("/icd10/browse/{node_id}", response_model=list[ICD10NodeOut])
+async def browse_icd10(node_id: str, request: Request):
+    children = request.app.state.icd10_tree.children(node_id)
+    if children is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ICD10 node '{node_id}'.")
+    return children
@@ -1,13 +1,24 @@
+import asyncio
 import json
+import time
 
+import httpx
+import ijson
 from fastapi import APIRouter, Depends, Request
 from fastapi.responses import Response
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
-from app.database import get_db
-from app.routers.validate import DataValue, ValidationError
+from app.database import get_read_db
+from app.deadline import Deadline, is_statement_timeout, set_statement_timeout
+from app.reference import from_db_or_memory
+from app.relay_guard import RelayRejected
+from app.routers.validate import VALIDATED_DATA_ELEMENTS, ValidationError
+from app.timing import stage
+from app.tracker_payload import scan_tracker_payload
 from app.validation import validate_event
+from app.validation_cache import ValidationOutcome
 
 router = APIRouter()
 
@@ -19,21 +30,59 @@ DHIS2_TRACKER_URL = f"{settings.DHIS2_BASE_URL}/api/tracker"
 VALIDATION_ERROR_CODE = "E1301"  # custom code: address hierarchy mismatch
 
 
-async def relay(request: Request, body: bytes, params: dict) -> Response:
+def error_response(message: str, status_code: int, retry_after: int | None = None) -> Response:
+    return Response(
+        content=json.dumps({"status": "ERROR", "message": message}),
+        status_code=status_code,
+        media_type="application/json",
+        headers={"Retry-After": str(retry_after)} if retry_after else None,
+    )
+
+
+def deadline_exceeded() -> Response:
+    return error_response("Request deadline exceeded.", 504)
+
+
+async def relay(request: Request, body: bytes, params: dict, deadline: Deadline) -> Response:
     """Forward the request to DHIS2, preserving the session cookie and returning
-    the response unchanged."""
+    the response unchanged. Sheds with 503 when DHIS2 is saturated or failing,
+    and gives up with 504 once the request's deadline has passed."""
     client = request.app.state.http_client
+    guard = request.app.state.relay_guard
     cookie = request.headers.get("cookie", "")
 
-    dhis2_resp = await client.post(
-        DHIS2_TRACKER_URL,
-        content=body,
-        params=params,
-        headers={
-            "Content-Type": "application/json",
-            "Cookie": cookie,
-        },
-    )
+    try:
+        async with guard.admit(max_wait=deadline.remaining()):
+            if deadline.expired:
+                guard.abandon()
+                return deadline_exceeded()
+            started = time.monotonic()
+            try:
+                with stage("relay"):
+                    # httpx limits each phase (connect, write, read) on its own; the deadline caps the whole call
+                    async with asyncio.timeout_at(deadline.expires_at):
+                        dhis2_resp = await client.post(
+                            DHIS2_TRACKER_URL,
+                            content=body,
+                            params=params,
+                            headers={
+                                "Content-Type": "application/json",
+                                "Cookie": cookie,
+                            },
+                            timeout=httpx.Timeout(settings.DHIS2_TIMEOUT, connect=settings.DHIS2_CONNECT_TIMEOUT),
+                        )
+            except TimeoutError:
+                guard.abandon()   # our budget ran out, not DHIS2's
+                return deadline_exceeded()
+            except httpx.TimeoutException:
+                guard.record(False, time.monotonic() - started)
+                return deadline_exceeded()
+            except httpx.TransportError as exc:
+                guard.record(False, time.monotonic() - started)
+                return error_response(f"DHIS2 did not respond ({exc.__class__.__name__}).", 502)
+            guard.record(dhis2_resp.status_code < 500, time.monotonic() - started)
+    except RelayRejected as exc:
+        return error_response(f"{exc.reason}, please retry later.", 503, exc.retry_after)
 
     return Response(
         content=dhis2_resp.content,
@@ -42,61 +91,93 @@ async def relay(request: Request, body: bytes, params: dict) -> Response:
     )
 
 
-@router.post("/proxy/tracker")
-async def proxy_tracker(
-    request: Request,
-    db: AsyncSession = Depends(get_db),
-) -> Response:
-    body = await request.body()
-    params = dict(request.query_params)
-
+async def check_submission(db: AsyncSession, body: bytes) -> bytes | None:
+    """Validate the target-program events in a tracker payload.
+    Returns the serialised 409 body, or None if the payload may be relayed."""
     try:
-        payload = json.loads(body)
-    except json.JSONDecodeError:
-        return await relay(request, body, params)
-
-    events = payload.get("events", [])
+        with stage("parse"):
+            target_events, total = await asyncio.to_thread(
+                scan_tracker_payload, body, TARGET_PROGRAMS, VALIDATED_DATA_ELEMENTS
+            )
+    except ijson.JSONError:
+        return None
 
     # Only validate events for the target program — relay the rest unchanged
-    target_events = [e for e in events if e.get("program") in TARGET_PROGRAMS]
     if not target_events:
-        return await relay(request, body, params)
+        return None
 
     # Validate
     errors: list[ValidationError] = []
     for event in target_events:
-        dvs = [DataValue(dataElement=dv["dataElement"], value=dv["value"])
-               for dv in event.get("dataValues", [])]
-        errors.extend(await validate_event(db, event.get("event", ""), dvs))
-
-    if errors:
-        total = len(events)
-        body = {
-            "status": "ERROR",
-            "validationReport": {
-                "errorReports": [
-                    {
-                        "message": e.message,
-                        "errorCode": VALIDATION_ERROR_CODE,
-                        "trackerType": "EVENT",
-                        "uid": e.event,
-                    }
-                    for e in errors
-                ],
-                "warningReports": [],
-            },
-            "stats": {
-                "created": 0,
-                "updated": 0,
-                "deleted": 0,
-                "ignored": total,
-                "total": total,
-            },
-        }
+        errors.extend(await validate_event(db, event.event, event.data_values))
+
+    if not errors:
+        return None
+
+    report = {
+        "status": "ERROR",
+        "validationReport": {
+            "errorReports": [
+                {
+                    "message": e.message,
+                    "errorCode": VALIDATION_ERROR_CODE,
+                    "trackerType": "EVENT",
+                    "uid": e.event,
+                    "suggestions": [sg.model_dump() for sg in e.suggestions],
+                }
+                for e in errors
+            ],
+            "warningReports": [],
+        },
+        "stats": {
+            "created": 0,
+            "updated": 0,
+            "deleted": 0,
+            "ignored": total,
+            "total": total,
+        },
+    }
+    return json.dumps(report).encode()
+
+
+@router.post("/proxy/tracker")
+async def proxy_tracker(
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+) -> Response:
+    # Don't spend time reading and validating a submission we can't relay
+    try:
+        request.app.state.relay_guard.check()
+    except RelayRejected as exc:
+        return error_response(f"{exc.reason}, please retry later.", 503, exc.retry_after)
+
+    deadline = Deadline.from_request(request)
+    params = dict(request.query_params)
+
+    try:
+        async with asyncio.timeout_at(deadline.expires_at):
+            body = await request.body()
+
+            # A byte-identical retry against the same reference data gets the same answer
+            cache = request.app.state.validation_cache
+            key = cache.key(request.app.state.reference_version, body)
+            outcome = cache.get(key)
+            if outcome is None:
+                await from_db_or_memory(lambda: set_statement_timeout(db, deadline), lambda: None)
+                outcome = ValidationOutcome(rejection=await check_submission(db, body))
+                cache.put(key, outcome)
+    except TimeoutError:
+        return deadline_exceeded()
+    except DBAPIError as exc:
+        if not is_statement_timeout(exc):
+            raise
+        return deadline_exceeded()
+
+    if outcome.rejection is not None:
         return Response(
-            content=json.dumps(body),
+            content=outcome.rejection,
             status_code=409,
             media_type="application/json",
         )
 
-    return await relay(request, body, params)
+    return await relay(request, body, params, deadline)
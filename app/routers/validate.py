@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends
-from pydantic import BaseModel
+from typing import AsyncIterator
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError as PydanticValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import ClientDisconnect
+from starlette.types import Receive, Scope, Send
 
-from app.database import get_db
+from app.database import get_read_db, read_sessionmaker
 
 router = APIRouter()
 
@@ -20,6 +25,9 @@ DE_ICD10_FIELDS = {
     "nQy5xQrOMXj": "CoD - Underlying Cause of Death",
 }
 
+# Every data element read by validate_event — all other data values are ignored
+VALIDATED_DATA_ELEMENTS = {DE_TOWNSHIP, DE_LOCATION, DE_WARD, DE_VILLAGE, *DE_ICD10_FIELDS}
+
 
 # ── Incoming payload schema ─────────────────────────────────────────────────
 
@@ -39,10 +47,17 @@ class EventPayload(BaseModel):
 
 # ── Response schema ─────────────────────────────────────────────────────────
 
+class Suggestion(BaseModel):
+    code: str
+    name: str
+    name_my: str | None
+
+
 class ValidationError(BaseModel):
     event: str
     field: str
     message: str
+    suggestions: list[Suggestion] = []   # nearest valid wards/villages, for address errors
 
 
 class ValidationResult(BaseModel):
@@ -50,6 +65,14 @@ class ValidationResult(BaseModel):
     errors: list[ValidationError] = []
 
 
+class EventResult(BaseModel):
+    """One NDJSON output line of /validate/stream."""
+    line: int
+    event: str
+    valid: bool
+    errors: list[ValidationError] = []
+
+
 # ── Helper ───────────────────────────────────────────────────────────────────
 
 def extract(data_values: list[DataValue], uid: str) -> str | None:
@@ -64,12 +87,125 @@ def extract(data_values: list[DataValue], uid: str) -> str | None:
 @router.post("/validate", response_model=ValidationResult)
 async def validate_events(
     payload: EventPayload,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ) -> ValidationResult:
-    from app.validation import validate_event
+    from app.validation import validate_batch
 
-    errors = []
-    for event in payload.events:
-        errors.extend(await validate_event(db, event.event, event.dataValues))
+    results = await validate_batch(db, [(e.event, e.dataValues) for e in payload.events])
+    errors = [err for event_errors in results for err in event_errors]
 
     return ValidationResult(valid=not errors, errors=errors)
+
+
+# ── Streaming endpoint ───────────────────────────────────────────────────────
+
+NDJSON_BATCH_SIZE = 1000   # events validated per round of queries
+NDJSON_MAX_LINE_BYTES = 1 << 20   # longer lines get an error result and are not buffered
+
+
+async def ndjson_lines(request: Request) -> AsyncIterator[tuple[int, bytes | None]]:
+    """
+    Yield (line number, line) for each non-blank line of the request body as it arrives.
+    A line longer than NDJSON_MAX_LINE_BYTES is yielded as (line number, None); the
+    rest of it is skipped rather than kept.
+    """
+    partial = bytearray()   # start of a line continued in the next chunk
+    too_long = False        # the line in `partial` went over the limit
+    line_no = 0
+    async for chunk in request.stream():
+        *ends, rest = chunk.split(b"\n")
+        for piece in ends:
+            line_no += 1
+            if too_long or len(partial) + len(piece) > NDJSON_MAX_LINE_BYTES:
+                yield line_no, None
+            elif partial:
+                partial += piece
+                if partial.strip():
+                    yield line_no, bytes(partial)
+            elif piece.strip():
+                yield line_no, piece
+            partial.clear()
+            too_long = False
+        if too_long:
+            continue
+        if len(partial) + len(rest) > NDJSON_MAX_LINE_BYTES:
+            partial.clear()
+            too_long = True
+        else:
+            partial += rest
+    if too_long:
+        yield line_no + 1, None
+    elif partial.strip():
+        yield line_no + 1, bytes(partial)
+
+
+def line_error(line_no: int, message: str) -> EventResult:
+    return EventResult(line=line_no, event="", valid=False, errors=[ValidationError(event="", field="", message=message)])
+
+
+async def validate_ndjson_batch(db: AsyncSession, batch: list[tuple[int, bytes | None]]) -> bytes:
+    from app.validation import validate_batch
+
+    parsed: list[tuple[int, Event]] = []
+    results: dict[int, EventResult] = {}
+    for line_no, line in batch:
+        if line is None:
+            results[line_no] = line_error(line_no, f"Line {line_no} is longer than {NDJSON_MAX_LINE_BYTES} bytes.")
+            continue
+        try:
+            parsed.append((line_no, Event.model_validate_json(line)))
+        except PydanticValidationError as exc:
+            results[line_no] = line_error(line_no, f"Line {line_no} is not a valid event: {exc.errors()[0]['msg']}.")
+
+    errors = await validate_batch(db, [(e.event, e.dataValues) for _, e in parsed])
+    for (line_no, event), event_errors in zip(parsed, errors):
+        results[line_no] = EventResult(line=line_no, event=event.event, valid=not event_errors, errors=event_errors)
+
+    return b"".join(results[line_no].model_dump_json().encode() + b"\n" for line_no, _ in batch)
+
+
+async def stream_results(request: Request) -> AsyncIterator[bytes]:
+    async with read_sessionmaker()() as db:
+        batch: list[tuple[int, bytes | None]] = []
+        async for item in ndjson_lines(request):
+            batch.append(item)
+            if len(batch) >= NDJSON_BATCH_SIZE:
+                yield await validate_ndjson_batch(db, batch)
+                await db.rollback()   # hand the connection back while we wait for more input
+                batch = []
+        if batch:
+            yield await validate_ndjson_batch(db, batch)
+
+
+class ValidationStream(StreamingResponse):
+    """
+    Streams the results of stream_results while the request body is still
+    arriving. A plain StreamingResponse can't: while it streams it listens on
+    `receive` for the client's disconnect, and that listener consumes the
+    request body messages, so the body reader would wait forever. Here
+    `receive` has one reader — the body stream, which raises ClientDisconnect
+    when the client goes away.
+    """
+    media_type = "application/x-ndjson"
+
+    def __init__(self) -> None:
+        self.status_code = 200
+        self.background = None
+        self.init_headers()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.body_iterator = stream_results(Request(scope, receive))
+        try:
+            await self.stream_response(send)
+        except (ClientDisconnect, OSError):
+            pass   # nobody left to send the results to
+
+
+@router.post("/validate/stream")
+async def validate_stream() -> ValidationStream:
+    """
+    Bulk variant of /validate: the body is NDJSON, one `Event` per line.
+    Results are streamed back as NDJSON, one `EventResult` per input line,
+    in batches of NDJSON_BATCH_SIZE.
+    """
+    return ValidationStream()
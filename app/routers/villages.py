@@ -1,9 +1,14 @@
 from fastapi import APIRouter, Depends, Query, HTTPException, Request
+from fastapi.responses import Response
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
-from app.schemas import TownshipOut, WardOut, VillageOut
+from app.burmese import is_myanmar, normalize_my
+from app.config import settings
+from app.database import fetch_json_array, get_read_db
+from app.reference import from_db_or_memory, reference_store
+from app.schemas import AddressOut, TownshipOut, WardOut, VillageOut
+from app.timing import stage
 
 router = APIRouter()
 
@@ -16,29 +21,45 @@ async def list_townships(request: Request):
 DHIS2_UID_PATTERN = r"^[A-Za-z][A-Za-z0-9]{10}$"
 
 
+def name_search_column(alias: str, q: str) -> tuple[str, str]:
+    """(column, search term) for a name query — Burmese queries search the normalised name_my."""
+    if is_myanmar(q):
+        return f"{alias}.name_my_norm", normalize_my(q)
+    return f"{alias}.name", q
+
+
+async def run_lookup(db: AsyncSession, query: str, params: dict, model: type) -> list | Response:
+    if settings.DB_RENDERED_JSON:
+        with stage("db"):
+            body = await fetch_json_array(db, query, params)
+        return Response(body, media_type="application/json")
+
+    with stage("db"):
+        rows = await db.execute(text(query), params)
+    return [model(**r) for r in rows.mappings()]
+
+
 @router.get("/wards", response_model=list[WardOut])
 async def search_wards(
     township_uid: str = Query(..., pattern=DHIS2_UID_PATTERN, description="DHIS2 UID of the township (11 chars, starts with a letter)"),
-    q: str | None = Query(None, description="Ward name search string"),
+    q: str | None = Query(None, description="Ward name search string (English or Burmese)"),
     limit: int = Query(50, ge=1, le=200),
-    db: AsyncSession = Depends(get_db),
-) -> list[WardOut]:
+    db: AsyncSession = Depends(get_read_db),
+) -> list[WardOut] | Response:
     if q:
-        stmt = text(
-            """
+        column, term = name_search_column("w", q)
+        query = f"""
             SELECT w.uid, w.code, w.name, w.name_my
             FROM   wards w
             JOIN   townships t ON t.id = w.township_id
             WHERE  t.uid = :township_uid
-              AND  w.name ILIKE '%' || :q || '%'
-            ORDER  BY similarity(w.name, :q) DESC
+              AND  {column} ILIKE '%' || :q || '%'
+            ORDER  BY similarity({column}, :q) DESC
             LIMIT  :limit
             """
-        )
-        rows = await db.execute(stmt, {"township_uid": township_uid, "q": q, "limit": limit})
+        params = {"township_uid": township_uid, "q": term, "limit": limit}
     else:
-        stmt = text(
-            """
+        query = """
             SELECT w.uid, w.code, w.name, w.name_my
             FROM   wards w
             JOIN   townships t ON t.id = w.township_id
@@ -46,35 +67,38 @@ async def search_wards(
             ORDER  BY w.name
             LIMIT  :limit
             """
-        )
-        rows = await db.execute(stmt, {"township_uid": township_uid, "limit": limit})
+        params = {"township_uid": township_uid, "limit": limit}
 
-    return [WardOut(uid=r.uid, code=r.code, name=r.name, name_my=r.name_my) for r in rows.mappings()]
+    return await from_db_or_memory(
+        lambda: run_lookup(db, query, params, WardOut),
+        lambda: [
+            WardOut(uid=p.uid, code=p.code, name=p.name, name_my=p.name_my)
+            for p in reference_store.search_places("ward", township_uid, q, limit)
+        ],
+    )
 
 
 @router.get("/villages", response_model=list[VillageOut])
 async def search_villages(
     township_uid: str = Query(..., pattern=DHIS2_UID_PATTERN, description="DHIS2 UID of the township (11 chars, starts with a letter)"),
-    q: str | None = Query(None, description="Village name search string"),
+    q: str | None = Query(None, description="Village name search string (English or Burmese)"),
     limit: int = Query(50, ge=1, le=200),
-    db: AsyncSession = Depends(get_db),
-) -> list[VillageOut]:
+    db: AsyncSession = Depends(get_read_db),
+) -> list[VillageOut] | Response:
     if q:
-        stmt = text(
-            """
+        column, term = name_search_column("v", q)
+        query = f"""
             SELECT v.uid, v.code, v.name, v.name_my
             FROM   villages v
             JOIN   townships t ON t.id = v.township_id
             WHERE  t.uid = :township_uid
-              AND  v.name ILIKE '%' || :q || '%'
-            ORDER  BY similarity(v.name, :q) DESC
+              AND  {column} ILIKE '%' || :q || '%'
+            ORDER  BY similarity({column}, :q) DESC
             LIMIT  :limit
             """
-        )
-        rows = await db.execute(stmt, {"township_uid": township_uid, "q": q, "limit": limit})
+        params = {"township_uid": township_uid, "q": term, "limit": limit}
     else:
-        stmt = text(
-            """
+        query = """
             SELECT v.uid, v.code, v.name, v.name_my
             FROM   villages v
             JOIN   townships t ON t.id = v.township_id
@@ -82,7 +106,56 @@ async def search_villages(
             ORDER  BY v.name
             LIMIT  :limit
             """
-        )
-        rows = await db.execute(stmt, {"township_uid": township_uid, "limit": limit})
+        params = {"township_uid": township_uid, "limit": limit}
+
+    return await from_db_or_memory(
+        lambda: run_lookup(db, query, params, VillageOut),
+        lambda: [
+            VillageOut(uid=p.uid, code=p.code, name=p.name, name_my=p.name_my)
+            for p in reference_store.search_places("village", township_uid, q, limit)
+        ],
+    )
+
+
+@router.get("/address/search", response_model=list[AddressOut])
+async def search_address(
+    township_uid: str = Query(..., pattern=DHIS2_UID_PATTERN, description="DHIS2 UID of the township (11 chars, starts with a letter)"),
+    q: str = Query(..., min_length=1, description="Ward or village name search string (English or Burmese)"),
+    limit: int = Query(20, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_db),
+) -> list[AddressOut] | Response:
+    """Wards and villages of a township in one ranked list, for when Urban/Rural is not known yet."""
+    ward_column, term = name_search_column("w", q)
+    village_column, _ = name_search_column("v", q)
+    query = f"""
+        SELECT a.type, a.uid, a.code, a.name, a.name_my, a.township_uid, a.township_name
+        FROM (
+            (SELECT 'ward' AS type, w.uid, w.code, w.name, w.name_my,
+                    t.uid AS township_uid, t.name AS township_name,
+                    similarity({ward_column}, :q) AS score
+             FROM   wards w
+             JOIN   townships t ON t.id = w.township_id
+             WHERE  t.uid = :township_uid
+               AND  {ward_column} ILIKE '%' || :q || '%'
+             ORDER  BY score DESC
+             LIMIT  :limit)
+            UNION ALL
+            (SELECT 'village' AS type, v.uid, v.code, v.name, v.name_my,
+                    t.uid AS township_uid, t.name AS township_name,
+                    similarity({village_column}, :q) AS score
+             FROM   villages v
+             JOIN   townships t ON t.id = v.township_id
+             WHERE  t.uid = :township_uid
+               AND  {village_column} ILIKE '%' || :q || '%'
+             ORDER  BY score DESC
+             LIMIT  :limit)
+        ) a
+        ORDER  BY a.score DESC, a.name
+        LIMIT  :limit
+        """
+    params = {"township_uid": township_uid, "q": term, "limit": limit}
 
-    return [VillageOut(uid=r.uid, code=r.code, name=r.name, name_my=r.name_my) for r in rows.mappings()]
+    return await from_db_or_memory(
+        lambda: run_lookup(db, query, params, AddressOut),
+        lambda: [AddressOut(**a) for a in reference_store.search_address(township_uid, q, limit)],
+    )
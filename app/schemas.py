@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import BaseModel
 
 
@@ -28,6 +30,16 @@ class VillageOut(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class AddressOut(BaseModel):
+    type: Literal["ward", "village"]
+    uid: str
+    code: str | None
+    name: str
+    name_my: str | None
+    township_uid: str
+    township_name: str
+
+
 class ICD10Out(BaseModel):
     uid: str
     code: str | None
@@ -37,6 +49,15 @@ class ICD10Out(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class ICD10NodeOut(BaseModel):
+    id: str                 # chapter numeral ("I"), block range ("A00-A09") or ICD10 code ("A00", "A00.0")
+    kind: Literal["chapter", "block", "category", "subcategory"]
+    name: str
+    uid: str | None         # DHIS2 option, if the node is one
+    code: str | None
+    child_count: int
+
+
 class ICD10Page(BaseModel):
     page: int
     limit: int
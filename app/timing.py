@@ -0,0 +1,46 @@
+"""
+Per-request stage timings, reported in the Server-Timing response header.
+
+The middleware in app.main opens a Timings for timed routes; code on the
+request path wraps its work in `with stage("name"):`. Outside a timed request
+(the offline CLI, streaming responses) stage() does nothing.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class Timings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = {}     # name → seconds, accumulated
+        self.first_stage_start: float | None = None
+        self.last_stage_end: float | None = None
+
+    def add(self, name: str, start: float, end: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + (end - start)
+        if self.first_stage_start is None:
+            self.first_stage_start = start
+        self.last_stage_end = end
+
+    def header(self) -> str:
+        total = time.perf_counter() - self.started
+        parts = [f"{name};dur={secs * 1000:.1f}" for name, secs in self.stages.items()]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+current_timings: ContextVar[Timings | None] = ContextVar("timings", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, start, time.perf_counter())
@@ -0,0 +1,107 @@
+"""
+Scan of /api/tracker payloads for the events we validate.
+
+Both the flat format (`events`) and the nested format
+(`trackedEntities → enrollments → events`, or top-level `enrollments`) are
+read with ijson.items on the collection prefixes, so the C backend builds one
+enrollment or event at a time: memory stays bounded by the largest enrollment,
+and the parse costs about what json.loads would.
+
+Two byte-level shortcuts avoid parsing passes that can't find anything. A
+payload that never mentions a target program has nothing to validate and is
+not parsed at all; and a top-level collection key is only looked for if it
+occurs more often than the nested occurrences already seen. Keys and UIDs are
+ASCII letters and digits, so only a \\u escape of one of those could hide them
+from the byte search; the escapes clients actually send (Burmese text, or
+Gson's \\u003c-style HTML escapes) leave the shortcuts in place.
+"""
+import re
+from dataclasses import dataclass, field
+
+import ijson
+
+from app.routers.validate import DataValue
+
+EVENT_PREFIXES = {
+    "events.item",
+    "enrollments.item.events.item",
+    "trackedEntities.item.enrollments.item.events.item",
+}
+
+
+@dataclass
+class TrackerEvent:
+    event: str = ""
+    program: str | None = None
+    data_values: list[DataValue] = field(default_factory=list)
+
+
+# \u escape of an ASCII letter or digit
+_ESCAPED_ALNUM = re.compile(rb"\\u00(?:3[0-9]|4[1-9a-fA-F]|5[0-9aA]|6[1-9a-fA-F]|7[0-9aA])")
+
+
+def _mentions(body: bytes, key: str) -> int:
+    return body.count(b'"%s"' % key.encode())
+
+
+def scan_tracker_payload(
+    body: bytes,
+    programs: set[str],
+    data_elements: set[str],
+) -> tuple[list[TrackerEvent], int]:
+    """
+    Return (events of `programs` carrying only `data_elements`, total event count).
+    Events without their own `program` inherit the enclosing enrollment's.
+    A payload that doesn't mention any of `programs` is not parsed: ([], 0).
+    Raises ijson.JSONError on malformed input. CPU-bound — run it off the event loop.
+    """
+    escaped = _ESCAPED_ALNUM.search(body) is not None
+    if not escaped and not any(program.encode() in body for program in programs):
+        return [], 0
+
+    targets: list[TrackerEvent] = []
+    total = 0
+    events_keys = 0   # "events" keys seen inside enrollments
+
+    def take(event, inherited: str | None) -> None:
+        nonlocal total
+        if not isinstance(event, dict):
+            return
+        total += 1
+        program = event.get("program")
+        if program is None:
+            program = inherited
+        if program not in programs:
+            return
+        data_values = event.get("dataValues")
+        targets.append(TrackerEvent(
+            event=event.get("event") or "",
+            program=program,
+            data_values=[
+                DataValue(dataElement=dv["dataElement"], value=str(dv["value"]))
+                for dv in (data_values if isinstance(data_values, list) else ())
+                if isinstance(dv, dict) and dv.get("dataElement") in data_elements and dv.get("value") is not None
+            ],
+        ))
+
+    def take_enrollments(enrollments) -> None:
+        nonlocal events_keys
+        for enrollment in enrollments:
+            if isinstance(enrollment, dict) and "events" in enrollment:
+                events_keys += 1
+                events = enrollment["events"]
+                for event in events if isinstance(events, list) else ():
+                    take(event, enrollment.get("program"))
+
+    nested_enrollments = 0
+    if escaped or _mentions(body, "trackedEntities"):
+        for enrollments in ijson.items(body, "trackedEntities.item.enrollments"):
+            nested_enrollments += 1
+            take_enrollments(enrollments if isinstance(enrollments, list) else ())
+    if escaped or _mentions(body, "enrollments") > nested_enrollments:
+        take_enrollments(ijson.items(body, "enrollments.item"))
+    if escaped or _mentions(body, "events") > events_keys:
+        for event in ijson.items(body, "events.item"):
+            take(event, None)
+
+    return targets, total
@@ -1,69 +1,91 @@
 """
 Core validation logic shared between /validate and /proxy/tracker.
 """
+from typing import NamedTuple
+
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.reference import from_db_or_memory, reference_store
+from app.timing import stage
 from app.routers.validate import (
     DE_TOWNSHIP,
     DE_LOCATION,
     DE_WARD,
     DE_VILLAGE,
     DE_ICD10_FIELDS,
+    Suggestion,
     ValidationError,
     extract,
 )
 
 
-async def check_ward(db: AsyncSession, township_code: str, ward_code: str) -> bool:
-    row = await db.execute(
-        text(
-            """
-            SELECT 1
-            FROM   wards w
-            JOIN   townships t ON t.id = w.township_id
-            WHERE  t.code = :township_code
-              AND  w.code = :ward_code
-            LIMIT 1
-            """
-        ),
-        {"township_code": township_code, "ward_code": ward_code},
+# The request-path statements, built once. asyncpg runs each as a server-side
+# prepared statement, cached on the connection under its SQL text.
+_WARD_EXISTS = text(
+    """
+    SELECT 1
+    FROM   wards w
+    JOIN   townships t ON t.id = w.township_id
+    WHERE  t.code = :township_code
+      AND  w.code = :ward_code
+    LIMIT 1
+    """
+)
+_VILLAGE_EXISTS = text(
+    """
+    SELECT 1
+    FROM   villages v
+    JOIN   townships t ON t.id = v.township_id
+    WHERE  t.code = :township_code
+      AND  v.code = :village_code
+    LIMIT 1
+    """
+)
+_ICD10_EXISTS = text("SELECT 1 FROM icd10_codes WHERE code = :code LIMIT 1")
+
+_EXISTING_ICD10 = text("SELECT code FROM icd10_codes WHERE code = ANY(CAST(:codes AS text[]))")
+_EXISTING_PLACES = {
+    kind: text(
+        f"""
+        SELECT t.code AS township_code, x.code
+        FROM   unnest(CAST(:township_codes AS text[]), CAST(:codes AS text[])) AS k(township_code, code)
+        JOIN   townships t ON t.code = k.township_code
+        JOIN   {table} x   ON x.township_id = t.id AND x.code = k.code
+        """
     )
+    for kind, table in (("ward", "wards"), ("village", "villages"))
+}
+
+
+async def check_ward(db: AsyncSession, township_code: str, ward_code: str) -> bool:
+    row = await db.execute(_WARD_EXISTS, {"township_code": township_code, "ward_code": ward_code})
     return row.first() is not None
 
 
 async def check_icd10_code(db: AsyncSession, code: str) -> bool:
-    row = await db.execute(
-        text("SELECT 1 FROM icd10_codes WHERE code = :code LIMIT 1"),
-        {"code": code},
-    )
+    row = await db.execute(_ICD10_EXISTS, {"code": code})
     return row.first() is not None
 
 
 async def check_village(db: AsyncSession, township_code: str, village_code: str) -> bool:
-    row = await db.execute(
-        text(
-            """
-            SELECT 1
-            FROM   villages v
-            JOIN   townships t ON t.id = v.township_id
-            WHERE  t.code = :township_code
-              AND  v.code = :village_code
-            LIMIT 1
-            """
-        ),
-        {"township_code": township_code, "village_code": village_code},
-    )
+    row = await db.execute(_VILLAGE_EXISTS, {"township_code": township_code, "village_code": village_code})
     return row.first() is not None
 
 
-async def validate_event(db: AsyncSession, event_uid: str, data_values: list) -> list[ValidationError]:
+class Check(NamedTuple):
+    """One reference lookup an event needs, and the error raised if it fails."""
+    kind: str                 # "ward" | "village" | "icd10"
+    key: tuple[str, ...]      # (township_code, ward_code) | (township_code, village_code) | (icd10_code,)
+    error: ValidationError
+
+
+def event_checks(event_uid: str, data_values: list) -> list[Check]:
     """
-    Validate a single event's data values.
+    The validation rules: which lookups an event's data values call for.
     Checks address hierarchy consistency and ICD10 code validity.
-    Returns a list of ValidationError (empty = valid).
     """
-    errors: list[ValidationError] = []
+    checks: list[Check] = []
 
     # ── Address validation ───────────────────────────────────────────────────
     township_code = extract(data_values, DE_TOWNSHIP)
@@ -73,28 +95,125 @@ async def validate_event(db: AsyncSession, event_uid: str, data_values: list) ->
 
     if township_code and location:
         if location == "Urban":
-            if ward_code and not await check_ward(db, township_code, ward_code):
-                errors.append(ValidationError(
+            if ward_code:
+                checks.append(Check("ward", (township_code, ward_code), ValidationError(
                     event=event_uid,
                     field=DE_WARD,
                     message=f"Ward '{ward_code}' does not belong to township '{township_code}'.",
-                ))
+                )))
         elif location == "Rural":
-            if village_code and not await check_village(db, township_code, village_code):
-                errors.append(ValidationError(
+            if village_code:
+                checks.append(Check("village", (township_code, village_code), ValidationError(
                     event=event_uid,
                     field=DE_VILLAGE,
                     message=f"Village '{village_code}' does not belong to township '{township_code}'.",
-                ))
+                )))
 
     # ── ICD10 validation ─────────────────────────────────────────────────────
     for de_uid, de_name in DE_ICD10_FIELDS.items():
         value = extract(data_values, de_uid)
-        if value and not await check_icd10_code(db, value):
-            errors.append(ValidationError(
+        if value:
+            checks.append(Check("icd10", (value,), ValidationError(
                 event=event_uid,
                 field=de_uid,
                 message=f"'{value}' is not a valid ICD10 code ({de_name}).",
-            ))
+            )))
+
+    return checks
 
+
+def failed(check: Check, suggested: dict[tuple[str, ...], list[Suggestion]] | None = None) -> ValidationError:
+    """
+    The error for a failed check, with the nearest valid candidates for address mismatches.
+    `suggested` remembers the candidates per (kind, township, value) across the checks of a batch.
+    """
+    if check.kind not in ("ward", "village"):
+        return check.error
+    township_code, value = check.key
+    if suggested is None:
+        suggested = {}
+    key = (check.kind, township_code, value)
+    if key not in suggested:
+        suggested[key] = reference_store.suggest(check.kind, township_code, value)
+    suggestions = suggested[key]
+    if not suggestions:
+        return check.error
+    closest = ", ".join(f"{s.name} ({s.code})" for s in suggestions)
+    return check.error.model_copy(update={
+        "message": f"{check.error.message} Closest matches: {closest}.",
+        "suggestions": suggestions,
+    })
+
+
+_CHECKERS = {
+    "ward": check_ward,
+    "village": check_village,
+    "icd10": check_icd10_code,
+}
+
+
+async def validate_event(db: AsyncSession, event_uid: str, data_values: list) -> list[ValidationError]:
+    """
+    Validate a single event's data values.
+    Returns a list of ValidationError (empty = valid).
+    """
+    with stage("validation-cpu"):
+        checks = event_checks(event_uid, data_values)
+
+    errors: list[ValidationError] = []
+    for check in checks:
+        with stage("validation-db"):
+            ok = await from_db_or_memory(
+                lambda: _CHECKERS[check.kind](db, *check.key),
+                lambda: reference_store.has(check.kind, check.key),
+            )
+        if not ok:
+            with stage("validation-cpu"):
+                errors.append(failed(check))
     return errors
+
+
+async def existing_keys(db: AsyncSession, kind: str, keys: set[tuple[str, ...]]) -> set[tuple[str, ...]]:
+    """Return the subset of `keys` of the given check kind that exist in the reference data."""
+    if not keys:
+        return set()
+
+    if kind == "icd10":
+        rows = await db.execute(_EXISTING_ICD10, {"codes": [k[0] for k in keys]})
+        return {(r.code,) for r in rows}
+
+    rows = await db.execute(
+        _EXISTING_PLACES[kind],
+        {"township_codes": [k[0] for k in keys], "codes": [k[1] for k in keys]},
+    )
+    return {(r.township_code, r.code) for r in rows}
+
+
+async def validate_batch(db: AsyncSession, events: list[tuple[str, list]]) -> list[list[ValidationError]]:
+    """
+    Validate many (event_uid, data_values) pairs with one query per check kind.
+    Returns one error list per event, in input order — same results as validate_event.
+    """
+    with stage("validation-cpu"):
+        per_event = [event_checks(uid, dvs) for uid, dvs in events]
+
+        wanted: dict[str, set[tuple[str, ...]]] = {kind: set() for kind in _CHECKERS}
+        for checks in per_event:
+            for check in checks:
+                wanted[check.kind].add(check.key)
+
+    with stage("validation-db"):
+        found = {
+            kind: await from_db_or_memory(
+                lambda: existing_keys(db, kind, keys),
+                lambda: reference_store.existing(kind, keys),
+            )
+            for kind, keys in wanted.items()
+        }
+
+    with stage("validation-cpu"):
+        suggested: dict[tuple[str, ...], list[Suggestion]] = {}   # the same bad code often recurs in a batch
+        return [
+            [failed(check, suggested) for check in checks if check.key not in found[check.kind]]
+            for checks in per_event
+        ]
@@ -0,0 +1,48 @@
+"""
+Short-lived cache of /proxy/tracker validation outcomes.
+
+DHIS2 Android clients retry the same POST after a timeout. A byte-identical
+retry validated against the same reference data always gets the same answer,
+so the outcome (relay, or the 409 body) is remembered for a few minutes.
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class ValidationOutcome:
+    rejection: bytes | None   # serialised 409 body, or None if the payload may be relayed
+
+
+class ValidationCache:
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, ValidationOutcome]] = OrderedDict()
+
+    @staticmethod
+    def key(reference_version: str, body: bytes) -> str:
+        h = hashlib.sha256(reference_version.encode())
+        h.update(b"\0")
+        h.update(body)
+        return h.hexdigest()
+
+    def get(self, key: str) -> ValidationOutcome | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, outcome: ValidationOutcome) -> None:
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, outcome)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
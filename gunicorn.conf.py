@@ -0,0 +1,55 @@
+"""
+Production runner: gunicorn master with one uvicorn worker process per CPU,
+all accepting on the socket the master listens on.
+
+  gunicorn -c gunicorn.conf.py app.main:app
+
+On SIGHUP (`systemctl reload village-lookup`) the master refreshes the
+reference snapshot, starts a new generation of workers with the current code
+and .env, and stops the old ones gracefully: they stop accepting, finish their
+in-flight requests (up to `graceful_timeout`) and exit, so a reload drops no
+requests.
+
+Nothing from `app` is imported here — the master must not hold modules the
+workers would then inherit instead of loading the new code on a reload.
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+
+def cpu_count() -> int:
+    """CPUs this process may run on (the container's cpuset, not the host's)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", cpu_count()))
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# A retiring worker gets as long as a /proxy/tracker request may take, plus a margin
+graceful_timeout = int(float(os.environ.get("PROXY_DEADLINE_SECONDS", 55))) + 5
+
+accesslog = "-"
+
+
+def refresh_snapshot(server) -> None:
+    """Bring the reference snapshot up to date before the workers load it."""
+    try:
+        subprocess.run([sys.executable, str(ROOT / "scripts" / "refresh_snapshot.py")], check=True, timeout=120)
+    except (OSError, subprocess.SubprocessError) as exc:
+        server.log.warning("Reference snapshot not refreshed, workers will reload from the database: %s", exc)
+
+
+def on_starting(server) -> None:
+    refresh_snapshot(server)
+
+
+def on_reload(server) -> None:
+    refresh_snapshot(server)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression check for the request-path queries.
+
+Runs the validation checks (app/validation.py) and the lookup route handlers
+against the database, records every statement they issue, refreshes the
+planner statistics (ANALYZE) and EXPLAINs each statement with the planner
+left to its own choices, as in production. Any scan of a large table that
+has no Index Cond reads the whole table: a Seq Scan, or an Index Scan used
+only for its order. The script lists the offenders and exits with status 1.
+An ordered index scan directly under a LIMIT is fine, since it stops after
+the rows it returns.
+
+Run after `alembic upgrade head` and the initial data load, and after any
+change to a query or migration:
+
+  python scripts/check_query_plans.py
+
+Required environment variables (or .env file):
+  DATABASE_URL            postgresql+asyncpg://...
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from sqlalchemy import event, text
+
+load_dotenv()
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config import settings  # noqa: E402
+from app.database import AsyncSessionLocal, engine  # noqa: E402
+from app.routers.icd10 import search_icd10  # noqa: E402
+from app.routers.villages import search_address, search_villages, search_wards  # noqa: E402
+from app.validation import check_icd10_code, check_village, check_ward, existing_keys  # noqa: E402
+
+# Tables too big to scan on every request (townships has ~330 rows and may be scanned)
+LARGE_TABLES = {"wards", "villages", "icd10_codes"}
+
+# Statements that read a whole large table by design: the total of the unfiltered /icd10 list
+WHOLE_TABLE_READS = {"SELECT COUNT(*) FROM icd10_codes"}
+
+
+def has_index_cond(plan: dict) -> bool:
+    """The node looks rows up by an index condition — a Bitmap Heap Scan through its Bitmap Index Scans."""
+    if "Index Cond" in plan:
+        return True
+    return plan.get("Node Type") == "Bitmap Heap Scan" and _bitmap_index_cond(plan)
+
+
+def _bitmap_index_cond(plan: dict) -> bool:
+    return any("Index Cond" in child or _bitmap_index_cond(child) for child in plan.get("Plans", []))
+
+
+def unindexed_scans(plan: dict, under_limit: bool = False) -> list[str]:
+    """Scans of large tables without an index condition, as "<node type> on <table>"."""
+    found = []
+    node = plan.get("Node Type")
+    table = plan.get("Relation Name")
+    if table in LARGE_TABLES and not has_index_cond(plan):
+        if not (under_limit and node in ("Index Scan", "Index Only Scan")):
+            found.append(f"{node} on {table}")
+    for child in plan.get("Plans", []):
+        found.extend(unindexed_scans(child, under_limit=node == "Limit"))
+    return found
+
+
+async def sample_keys(db) -> dict:
+    """Real codes to query with, so the plans match production shapes."""
+    row = (await db.execute(text(
+        """
+        SELECT t.uid AS township_uid, t.code AS township_code, w.code AS ward_code, v.code AS village_code
+        FROM   townships t
+        JOIN   wards w    ON w.township_id = t.id
+        JOIN   villages v ON v.township_id = t.id
+        WHERE  t.code IS NOT NULL AND w.code IS NOT NULL AND v.code IS NOT NULL
+        LIMIT  1
+        """
+    ))).mappings().first()
+    icd10 = (await db.execute(text("SELECT code FROM icd10_codes WHERE code IS NOT NULL LIMIT 1"))).scalar()
+    if row is None or icd10 is None:
+        sys.exit("No reference data loaded — run scripts/load_dhis2.py first.")
+    return {**row, "icd10_code": icd10}
+
+
+async def exercise(db, k: dict) -> None:
+    """Call every request-path query once."""
+    await check_ward(db, k["township_code"], k["ward_code"])
+    await check_village(db, k["township_code"], k["village_code"])
+    await check_icd10_code(db, k["icd10_code"])
+    await existing_keys(db, "ward", {(k["township_code"], k["ward_code"])})
+    await existing_keys(db, "village", {(k["township_code"], k["village_code"])})
+    await existing_keys(db, "icd10", {(k["icd10_code"],)})
+
+    for rendered in (False, True):
+        settings.DB_RENDERED_JSON = rendered
+        for q in (None, "shw", "မြန်"):
+            await search_wards(township_uid=k["township_uid"], q=q, limit=50, db=db)
+            await search_villages(township_uid=k["township_uid"], q=q, limit=50, db=db)
+        for q in ("shw", "မြန်"):
+            await search_address(township_uid=k["township_uid"], q=q, limit=20, db=db)
+        for q in (None, "cholera", "A00"):
+            await search_icd10(q=q, page=2, limit=50, db=db)
+
+
+async def main() -> None:
+    captured: list[tuple[str, object]] = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    async with AsyncSessionLocal() as db:
+        keys = await sample_keys(db)
+        captured.clear()
+        await exercise(db, keys)
+    event.remove(engine.sync_engine, "before_cursor_execute", _capture)
+
+    unique: dict[str, object] = {}
+    for statement, parameters in captured:
+        unique.setdefault(statement, parameters)
+
+    failures = 0
+    async with engine.connect() as conn:
+        # Current statistics, so the plans are the ones the tables' real sizes get
+        await conn.execute(text(f"ANALYZE townships, {', '.join(sorted(LARGE_TABLES))}"))
+        await conn.commit()
+        for statement, parameters in unique.items():
+            summary = " ".join(statement.split())
+            if summary in WHOLE_TABLE_READS:
+                print(f"skip  {summary[:160]}")
+                continue
+            result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+            plan = result.scalar()
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            scans = unindexed_scans(plan[0]["Plan"])
+            if scans:
+                failures += 1
+                print(f"FAIL  {', '.join(sorted(set(scans)))} without an index condition: {summary[:160]}")
+            else:
+                print(f"ok    {summary[:160]}")
+    await engine.dispose()
+
+    print(f"\n{len(unique)} queries checked, {failures} scanning a large table without an index condition.")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Check that the Postgres-rendered JSON bodies (DB_RENDERED_JSON) match the ones
+built in Python.
+
+Calls each lookup route handler twice against the database, once with
+DB_RENDERED_JSON off and once with it on, parses the rendered body with the
+route's response model (WardOut, VillageOut, AddressOut, ICD10Page) and
+compares the two results, order included. Lists the routes that differ and
+exits with status 1 if any do.
+
+Run after any change to a lookup query, a response model or fetch_json_array:
+
+  python scripts/check_rendered_json.py
+
+Required environment variables (or .env file):
+  DATABASE_URL            postgresql+asyncpg://...
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import text
+
+load_dotenv()
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config import settings  # noqa: E402
+from app.database import AsyncSessionLocal, engine  # noqa: E402
+from app.reference import reference_store  # noqa: E402
+from app.routers.icd10 import search_icd10  # noqa: E402
+from app.routers.villages import search_address, search_villages, search_wards  # noqa: E402
+from app.schemas import AddressOut, ICD10Page, VillageOut, WardOut  # noqa: E402
+
+NAME_TERMS = [None, "a", "shw", "မြန်"]
+ICD10_TERMS = [None, "fever", "cholera", "A00", "J18"]
+
+
+async def sample_townships(db) -> list[str]:
+    """The townships with the most wards and villages — the longest, most tie-prone lists."""
+    uids = (await db.execute(text(
+        """
+        SELECT t.uid
+        FROM   townships t
+        LEFT   JOIN wards w    ON w.township_id = t.id
+        LEFT   JOIN villages v ON v.township_id = t.id
+        GROUP  BY t.uid
+        ORDER  BY count(DISTINCT w.id) + count(DISTINCT v.id) DESC
+        LIMIT  3
+        """
+    ))).scalars().all()
+    if not uids:
+        sys.exit("No reference data loaded — run scripts/load_dhis2.py first.")
+    return uids
+
+
+def calls(townships: list[str]):
+    """(description, response type, coroutine function of a session) for each route call to compare."""
+    for uid in townships:
+        for q in NAME_TERMS:
+            yield (f"/wards township_uid={uid} q={q!r}", list[WardOut],
+                   lambda db, uid=uid, q=q: search_wards(township_uid=uid, q=q, limit=200, db=db))
+            yield (f"/villages township_uid={uid} q={q!r}", list[VillageOut],
+                   lambda db, uid=uid, q=q: search_villages(township_uid=uid, q=q, limit=200, db=db))
+            if q:
+                yield (f"/address/search township_uid={uid} q={q!r}", list[AddressOut],
+                       lambda db, uid=uid, q=q: search_address(township_uid=uid, q=q, limit=200, db=db))
+    for q in ICD10_TERMS:
+        for page in (1, 3):
+            yield (f"/icd10 q={q!r} page={page}", ICD10Page,
+                   lambda db, q=q, page=page: search_icd10(q=q, page=page, limit=50, db=db))
+
+
+async def main() -> None:
+    failures = checked = 0
+    async with AsyncSessionLocal() as db:
+        townships = await sample_townships(db)
+        for description, response_type, call in calls(townships):
+            settings.DB_RENDERED_JSON = False
+            expected = await call(db)
+            settings.DB_RENDERED_JSON = True
+            rendered = await call(db)
+            if reference_store.db_down:
+                sys.exit("Lost the database connection — results would be from memory.")
+
+            checked += 1
+            try:
+                actual = TypeAdapter(response_type).validate_json(rendered.body)
+            except ValidationError as exc:
+                failures += 1
+                print(f"FAIL  {description}: rendered body doesn't fit the response model: {exc.errors()[0]['msg']}")
+                continue
+            if actual == expected:
+                print(f"ok    {description}")
+                continue
+            failures += 1
+            if isinstance(expected, ICD10Page):
+                if (actual.page, actual.limit, actual.total) != (expected.page, expected.limit, expected.total):
+                    print(f"FAIL  {description}: page, limit or total differ")
+                    continue
+                expected, actual = expected.results, actual.results
+            same_rows = sorted(m.model_dump_json() for m in actual) == sorted(m.model_dump_json() for m in expected)
+            print(f"FAIL  {description}: {'same rows in a different order' if same_rows else 'different rows'}")
+    await engine.dispose()
+
+    print(f"\n{checked} calls checked, {failures} where the rendered JSON differs.")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -18,7 +18,9 @@ Required environment variables (or .env file):
 
 import asyncio
 import os
+import sys
 from collections import defaultdict
+from pathlib import Path
 
 import httpx
 from dotenv import load_dotenv
@@ -27,6 +29,10 @@ from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 
 load_dotenv()
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.burmese import normalize_my  # noqa: E402
+
 DHIS2_BASE_URL = os.environ["DHIS2_BASE_URL"].rstrip("/")
 DHIS2_USERNAME = os.environ["DHIS2_USERNAME"]
 DHIS2_PASSWORD = os.environ["DHIS2_PASSWORD"]
@@ -169,13 +175,14 @@ async def upsert_in_batches(session, table: str, rows: list[dict]) -> None:
         await session.execute(
             text(
                 f"""
-                INSERT INTO {table} (uid, code, name, name_my, township_id)
-                VALUES (:uid, :code, :name, :name_my, :township_id)
+                INSERT INTO {table} (uid, code, name, name_my, name_my_norm, township_id)
+                VALUES (:uid, :code, :name, :name_my, :name_my_norm, :township_id)
                 ON CONFLICT (uid) DO UPDATE
-                  SET code        = EXCLUDED.code,
-                      name        = EXCLUDED.name,
-                      name_my     = EXCLUDED.name_my,
-                      township_id = EXCLUDED.township_id
+                  SET code         = EXCLUDED.code,
+                      name         = EXCLUDED.name,
+                      name_my      = EXCLUDED.name_my,
+                      name_my_norm = EXCLUDED.name_my_norm,
+                      township_id  = EXCLUDED.township_id
                 """
             ),
             batch,
@@ -236,13 +243,21 @@ async def main() -> None:
     print(f"  {len(uid_to_db_id)} townships saved.")
 
     ward_rows = [
-        {**ward_opts[uid], "township_id": uid_to_db_id[ward_link[uid]]}
+        {
+            **ward_opts[uid],
+            "name_my_norm": normalize_my(ward_opts[uid]["name_my"]),
+            "township_id": uid_to_db_id[ward_link[uid]],
+        }
         for uid in ward_link
         if uid in ward_opts and ward_link[uid] in uid_to_db_id
     ]
 
     village_rows = [
-        {**village_opts[uid], "township_id": uid_to_db_id[village_link[uid]]}
+        {
+            **village_opts[uid],
+            "name_my_norm": normalize_my(village_opts[uid]["name_my"]),
+            "township_id": uid_to_db_id[village_link[uid]],
+        }
         for uid in village_link
         if uid in village_opts and village_link[uid] in uid_to_db_id
     ]
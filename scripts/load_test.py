@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Load test for the request-path queries, with and without prepared-statement caching.
+
+Runs the validation checks (app/validation.py) and the lookup route handlers
+against the database from many concurrent tasks, one session per operation
+as a request would use, through a pool built with the DB_POOL_* settings.
+Each run uses a different asyncpg prepared-statement cache size (0 = every
+statement is prepared anew on each execution) and reports throughput and
+latency percentiles, so the effect of the cache and of the pool sizing can
+be compared on the real database.
+
+  python scripts/load_test.py
+  python scripts/load_test.py --seconds 30 --concurrency 64 --cache-sizes 0,100,200
+
+Required environment variables (or .env file):
+  DATABASE_URL            postgresql+asyncpg://...
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+load_dotenv()
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config import settings  # noqa: E402
+from app.database import make_engine  # noqa: E402
+from app.reference import reference_store  # noqa: E402
+from app.routers.icd10 import search_icd10  # noqa: E402
+from app.routers.villages import search_address, search_villages, search_wards  # noqa: E402
+from app.validation import check_icd10_code, check_village, check_ward, existing_keys  # noqa: E402
+
+SAMPLE_SIZE = 200
+SEARCH_TERMS = ["a", "gy", "shw", "tha", "မြ"]
+ICD10_TERMS = [None, "fever", "chol", "A00", "J18"]
+
+
+async def sample(db) -> dict:
+    """Real keys to query with, so the load matches production shapes."""
+    places = {}
+    for kind, table in (("ward", "wards"), ("village", "villages")):
+        rows = await db.execute(text(
+            f"""
+            SELECT t.uid AS township_uid, t.code AS township_code, x.code
+            FROM   {table} x JOIN townships t ON t.id = x.township_id
+            WHERE  t.code IS NOT NULL AND x.code IS NOT NULL
+            ORDER  BY random()
+            LIMIT  {SAMPLE_SIZE}
+            """
+        ))
+        places[kind] = rows.all()
+    icd10 = (await db.execute(text(
+        f"SELECT code FROM icd10_codes WHERE code IS NOT NULL ORDER BY random() LIMIT {SAMPLE_SIZE}"
+    ))).scalars().all()
+    if not places["ward"] or not places["village"] or not icd10:
+        sys.exit("No reference data loaded — run scripts/load_dhis2.py first.")
+    return {**places, "icd10": icd10}
+
+
+def operations(s: dict):
+    """(name, coroutine function of a session) — the mix of request-path work."""
+    def ward(db):
+        r = random.choice(s["ward"])
+        return check_ward(db, r.township_code, r.code)
+
+    def village(db):
+        r = random.choice(s["village"])
+        return check_village(db, r.township_code, r.code)
+
+    def icd10(db):
+        return check_icd10_code(db, random.choice(s["icd10"]))
+
+    def batch(db):
+        return existing_keys(db, "village", {(r.township_code, r.code) for r in random.sample(s["village"], 20)})
+
+    def wards_search(db):
+        return search_wards(township_uid=random.choice(s["ward"]).township_uid,
+                            q=random.choice([None, *SEARCH_TERMS]), limit=50, db=db)
+
+    def villages_search(db):
+        return search_villages(township_uid=random.choice(s["village"]).township_uid,
+                               q=random.choice([None, *SEARCH_TERMS]), limit=50, db=db)
+
+    def address_search(db):
+        return search_address(township_uid=random.choice(s["village"]).township_uid,
+                              q=random.choice(SEARCH_TERMS), limit=20, db=db)
+
+    def icd10_search(db):
+        return search_icd10(q=random.choice(ICD10_TERMS), page=1, limit=50, db=db)
+
+    return [ward, village, icd10, ward, village, icd10, batch, wards_search, villages_search, address_search,
+            icd10_search]
+
+
+async def run(cache_size: int, s: dict, seconds: float, concurrency: int) -> dict:
+    engine = make_engine(settings.DATABASE_URL, statement_cache_size=cache_size)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    ops = operations(s)
+    latencies: list[float] = []
+
+    async def worker(until: float) -> None:
+        while time.perf_counter() < until:
+            op = random.choice(ops)
+            started = time.perf_counter()
+            async with sessions() as db:
+                await op(db)
+            latencies.append(time.perf_counter() - started)
+
+    # Warm-up: open the pool and fill the statement caches, then measure
+    await asyncio.gather(*(worker(time.perf_counter() + 1) for _ in range(concurrency)))
+    latencies.clear()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(started + seconds) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+
+    if reference_store.db_down:
+        sys.exit("Lost the database connection during the run — results would be from memory.")
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "cache": cache_size,
+        "ops": len(latencies),
+        "ops_per_s": len(latencies) / elapsed,
+        "p50": quantiles[49] * 1000,
+        "p95": quantiles[94] * 1000,
+        "p99": quantiles[98] * 1000,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the request-path queries.")
+    parser.add_argument("--seconds", type=float, default=15.0, help="measured duration per run")
+    parser.add_argument("--concurrency", type=int, default=2 * settings.DB_POOL_SIZE,
+                        help="concurrent simulated requests (default: twice DB_POOL_SIZE)")
+    parser.add_argument("--cache-sizes", default=f"0,100,{settings.DB_STATEMENT_CACHE_SIZE}",
+                        help="comma-separated prepared-statement cache sizes to compare "
+                             "(default: none, the asyncpg default of 100, and DB_STATEMENT_CACHE_SIZE)")
+    args = parser.parse_args()
+
+    engine = make_engine(settings.DATABASE_URL)
+    async with async_sessionmaker(engine)() as db:
+        s = await sample(db)
+    await engine.dispose()
+
+    print(f"pool_size={settings.DB_POOL_SIZE} max_overflow={settings.DB_MAX_OVERFLOW} "
+          f"pre_ping={settings.DB_POOL_PRE_PING} concurrency={args.concurrency} seconds={args.seconds}\n")
+    print(f"{'cache':>6} {'ops':>8} {'ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    results = []
+    for cache_size in dict.fromkeys(int(c) for c in args.cache_sizes.split(",")):
+        r = await run(cache_size, s, args.seconds, args.concurrency)
+        results.append(r)
+        print(f"{r['cache']:>6} {r['ops']:>8} {r['ops_per_s']:>9.0f} {r['p50']:>8.2f} {r['p95']:>8.2f} {r['p99']:>8.2f}")
+
+    baseline = results[0]["ops_per_s"]
+    for r in results[1:]:
+        print(f"\ncache {r['cache']} vs {results[0]['cache']}: {r['ops_per_s'] / baseline:.2f}x throughput")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Bring the reference data snapshot (REFERENCE_SNAPSHOT_PATH) up to date with the database.
+
+The gunicorn master (gunicorn.conf.py) runs this before it starts or reloads
+workers, so every worker starts from the same, current snapshot and only has
+to confirm its version with Postgres instead of reading all the tables. Exits
+with status 1 if the database can't be read; the existing snapshot is then
+left as it is.
+
+  python scripts/refresh_snapshot.py
+
+Required environment variables (or .env file):
+  DATABASE_URL            postgresql+asyncpg://...
+  REFERENCE_SNAPSHOT_PATH (defaults to reference_snapshot.json.gz)
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+load_dotenv()
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config import settings  # noqa: E402
+from app.database import make_engine  # noqa: E402
+from app.reference import ReferenceData, reference_version  # noqa: E402
+
+
+def snapshot_version(path: Path) -> str | None:
+    try:
+        return ReferenceData.read(path).version
+    except Exception:
+        return None
+
+
+async def main() -> None:
+    if not settings.REFERENCE_SNAPSHOT_PATH:
+        sys.exit("REFERENCE_SNAPSHOT_PATH is empty — snapshots are disabled.")
+    path = Path(settings.REFERENCE_SNAPSHOT_PATH)
+
+    engine = make_engine(settings.DATABASE_URL)
+    try:
+        async with async_sessionmaker(engine)() as db:
+            version = await reference_version(db)
+            if version == snapshot_version(path):
+                print(f"{path} is up to date (version {version}).")
+                return
+            data = await ReferenceData.from_db(db)
+    except Exception as exc:
+        sys.exit(f"Could not read the reference data: {exc}")
+    finally:
+        await engine.dispose()
+
+    data.write(path)
+    print(f"Wrote {path} (version {data.version}): {len(data.townships)} townships, "
+          f"{len(data.wards)} wards, {len(data.villages)} villages, {len(data.icd10)} ICD10 codes.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
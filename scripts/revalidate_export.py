@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Audit a DHIS2 event export against the current reference tables, offline.
+
+Applies the same rules as validate_event (app/validation.py), but the ward,
+village and ICD10 reference sets are loaded from the database once and the
+events are checked in memory across a process pool. A CSV export is split into
+byte ranges at event boundaries, each parsed and checked by a worker; a JSON
+export is read with ijson.items (C backend) and checked in chunks.
+
+Input formats:
+  - JSON  → /api/tracker/events export ({"instances": [...]}), the older
+            /api/events export ({"events": [...]}) or a nested tracker payload;
+            events without a `program` inherit their enrollment's
+  - CSV   → one row per data value, with at least the columns
+            event, dataElement, value (and optionally program — without it
+            every event is checked)
+
+Output:
+  - errors CSV (event, field, message)
+  - summary JSON with per-field error counts (printed as well)
+
+Usage:
+  python scripts/revalidate_export.py export.json --output errors.csv
+  python scripts/revalidate_export.py export.csv --output errors.csv --workers 16
+
+Required environment variables (or .env file):
+  DATABASE_URL            postgresql+asyncpg://...
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple, TextIO
+
+import ijson
+from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+load_dotenv()
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.routers.proxy import TARGET_PROGRAMS  # noqa: E402
+from app.routers.validate import (  # noqa: E402
+    DE_ICD10_FIELDS,
+    DE_VILLAGE,
+    DE_WARD,
+    VALIDATED_DATA_ELEMENTS,
+)
+from app.validation import event_checks  # noqa: E402
+
+DATABASE_URL = os.environ["DATABASE_URL"]
+
+CHUNK_SIZE = 5000                # JSON events per worker task
+CSV_PART_BYTES = 16 * 1024 ** 2  # CSV bytes per worker task
+
+FIELD_LABELS = {
+    DE_WARD: "Permanent Address - Ward Name",
+    DE_VILLAGE: "Permanent Address - Village Name",
+    **DE_ICD10_FIELDS,
+}
+
+
+class DV(NamedTuple):
+    """Lightweight stand-in for DataValue — extract() only reads these two attributes."""
+    dataElement: str
+    value: str
+
+
+# (event_uid, [DV, ...]) — only the data values validate_event reads
+ExportEvent = tuple[str, list[DV]]
+
+
+# ── Reference data ───────────────────────────────────────────────────────────
+
+async def load_reference_sets() -> dict[str, set[tuple[str, ...]]]:
+    """Return {check kind → set of valid keys}, matching the keys built by event_checks."""
+    engine = create_async_engine(DATABASE_URL, echo=False)
+    async with engine.connect() as conn:
+        wards = await conn.execute(text(
+            """
+            SELECT t.code AS township_code, w.code
+            FROM   wards w JOIN townships t ON t.id = w.township_id
+            WHERE  t.code IS NOT NULL AND w.code IS NOT NULL
+            """
+        ))
+        villages = await conn.execute(text(
+            """
+            SELECT t.code AS township_code, v.code
+            FROM   villages v JOIN townships t ON t.id = v.township_id
+            WHERE  t.code IS NOT NULL AND v.code IS NOT NULL
+            """
+        ))
+        icd10 = await conn.execute(text("SELECT code FROM icd10_codes WHERE code IS NOT NULL"))
+        reference = {
+            "ward": {(r.township_code, r.code) for r in wards},
+            "village": {(r.township_code, r.code) for r in villages},
+            "icd10": {(r.code,) for r in icd10},
+        }
+    await engine.dispose()
+    return reference
+
+
+# ── Worker side ──────────────────────────────────────────────────────────────
+
+_reference: dict[str, set[tuple[str, ...]]] = {}
+
+
+def init_worker(reference: dict[str, set[tuple[str, ...]]]) -> None:
+    global _reference
+    _reference = reference
+
+
+def check_chunk(events: Iterable[ExportEvent]) -> tuple[int, list[tuple[str, str, str]]]:
+    """Return (events checked, [(event, field, message), ...]) for one chunk."""
+    checked = 0
+    errors = []
+    for event_uid, data_values in events:
+        checked += 1
+        for check in event_checks(event_uid, data_values):
+            if check.key not in _reference[check.kind]:
+                errors.append((check.error.event, check.error.field, check.error.message))
+    return checked, errors
+
+
+def check_csv_range(path: Path, header: bytes, start: int, end: int) -> tuple[int, list[tuple[str, str, str]]]:
+    """check_chunk for the CSV rows in bytes [start, end) of the export."""
+    with path.open("rb") as f:
+        f.seek(start)
+        rows = f.read(end - start)
+    return check_chunk(csv_events(io.StringIO((header + rows).decode("utf-8"), newline="")))
+
+
+# ── Readers ──────────────────────────────────────────────────────────────────
+
+def export_event(event: dict) -> ExportEvent:
+    return event.get("event", ""), [
+        DV(dv["dataElement"], str(dv["value"]))
+        for dv in event.get("dataValues", [])
+        if dv.get("dataElement") in VALIDATED_DATA_ELEMENTS and dv.get("value") is not None
+    ]
+
+
+def csv_events(f: TextIO) -> Iterator[ExportEvent]:
+    """Rows are grouped by consecutive `event` values, as DHIS2 writes them."""
+    reader = csv.DictReader(f)
+    has_program = "program" in (reader.fieldnames or ())
+    current: str | None = None
+    program: str | None = None
+    data_values: list[DV] = []
+    for row in reader:
+        if row["event"] != current:
+            if current is not None and (not has_program or program in TARGET_PROGRAMS):
+                yield current, data_values
+            current, program, data_values = row["event"], row.get("program"), []
+        if row["dataElement"] in VALIDATED_DATA_ELEMENTS and row["value"]:
+            data_values.append(DV(row["dataElement"], row["value"]))
+    if current is not None and (not has_program or program in TARGET_PROGRAMS):
+        yield current, data_values
+
+
+def read_record(f) -> bytes:
+    """The next CSV record from a binary file positioned at a record start (b"" at the end)."""
+    record = f.readline()
+    while record.count(b'"') % 2 and (line := f.readline()):
+        record += line   # a quoted field with a line break in it
+    return record
+
+
+def split_csv(path: Path, part_bytes: int) -> tuple[bytes, list[tuple[int, int]]]:
+    """
+    (header record, [(start, end), ...]) — byte ranges of about `part_bytes` covering the
+    data rows. Each range starts at a record where the event changes, so an event's rows
+    are never split; quotes are counted from the previous range start to find records.
+    """
+    size = path.stat().st_size
+    with path.open("rb") as f:
+        header = read_record(f)
+        event_column = next(csv.reader(io.StringIO(header.decode("utf-8"), newline=""))).index("event")
+
+        def event_of(record: bytes) -> str:
+            return next(csv.reader(io.StringIO(record.decode("utf-8"), newline="")))[event_column]
+
+        starts = [f.tell()]
+        while starts[-1] + part_bytes < size:
+            # Quote parity at the cut tells whether it falls inside a quoted field
+            f.seek(starts[-1])
+            quotes = 0
+            while (left := starts[-1] + part_bytes - f.tell()) > 0:
+                quotes += f.read(min(left, 1024 ** 2)).count(b'"')
+            quotes += f.readline().count(b'"')
+            while quotes % 2 and (line := f.readline()):
+                quotes += line.count(b'"')
+
+            # Move on to the first record of the next event
+            first_event = None
+            while True:
+                start = f.tell()
+                record = read_record(f)
+                if not record:
+                    break
+                event = event_of(record)
+                if first_event is None:
+                    first_event = event
+                elif event != first_event:
+                    break
+            if not record:
+                break
+            starts.append(start)
+    return header, list(zip(starts, starts[1:] + [size]))
+
+
+def key_counts(path: Path, keys: list[str]) -> dict[str, int]:
+    """How often each `"key"` occurs in the file — a byte scan, much cheaper than a parse."""
+    needles = {key: b'"%s"' % key.encode() for key in keys}
+    overlap = max(len(needle) for needle in needles.values()) - 1
+    counts = dict.fromkeys(keys, 0)
+    tail = b""
+    with path.open("rb") as f:
+        while block := f.read(1024 ** 2):
+            data = tail + block
+            for key, needle in needles.items():
+                counts[key] += data.count(needle) - tail.count(needle)
+            tail = data[-overlap:]
+    return counts
+
+
+def read_json(path: Path) -> Iterator[ExportEvent]:
+    """
+    The target-program events of a JSON export, one ijson.items pass per collection
+    the file contains. As in scan_tracker_payload (app/tracker_payload.py), events
+    without their own `program` inherit the enrollment's, and a top-level collection
+    key is only looked for if it occurs more often than its nested occurrences.
+    """
+    counts = key_counts(path, ["trackedEntities", "enrollments", "events", "instances"])
+    nested_enrollments = events_keys = 0
+
+    def items(prefix: str) -> Iterator:
+        with path.open("rb") as f:
+            yield from ijson.items(f, prefix)
+
+    def take(event, inherited: str | None) -> Iterator[ExportEvent]:
+        if not isinstance(event, dict):
+            return
+        program = event.get("program")
+        if program is None:
+            program = inherited
+        if program in TARGET_PROGRAMS:
+            yield export_event(event)
+
+    def take_enrollments(enrollments) -> Iterator[ExportEvent]:
+        nonlocal events_keys
+        for enrollment in enrollments:
+            if isinstance(enrollment, dict) and "events" in enrollment:
+                events_keys += 1
+                events = enrollment["events"]
+                for event in events if isinstance(events, list) else ():
+                    yield from take(event, enrollment.get("program"))
+
+    if counts["trackedEntities"]:
+        for enrollments in items("trackedEntities.item.enrollments"):
+            nested_enrollments += 1
+            yield from take_enrollments(enrollments if isinstance(enrollments, list) else ())
+    if counts["enrollments"] > nested_enrollments:
+        yield from take_enrollments(items("enrollments.item"))
+    if counts["events"] > events_keys:
+        for event in items("events.item"):
+            yield from take(event, None)
+    if counts["instances"]:
+        for event in items("instances.item"):
+            yield from take(event, None)
+
+
+def chunked(events: Iterator[ExportEvent], size: int) -> Iterator[list[ExportEvent]]:
+    chunk: list[ExportEvent] = []
+    for event in events:
+        chunk.append(event)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ── Main ─────────────────────────────────────────────────────────────────────
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-validate a DHIS2 event export offline.")
+    parser.add_argument("export", type=Path, help="JSON or CSV event export")
+    parser.add_argument("--output", type=Path, default=Path("revalidation_errors.csv"),
+                        help="errors CSV (default: revalidation_errors.csv)")
+    parser.add_argument("--summary", type=Path, default=None,
+                        help="summary JSON (default: <output>.summary.json)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="JSON events per worker task")
+    args = parser.parse_args()
+
+    summary_path = args.summary or args.output.with_suffix(".summary.json")
+
+    print("Loading reference data ...", flush=True)
+    reference = asyncio.run(load_reference_sets())
+    print(f"  → {len(reference['ward'])} wards, {len(reference['village'])} villages, "
+          f"{len(reference['icd10'])} ICD10 codes")
+
+    started = time.monotonic()
+    checked = 0
+    failed_events: set[str] = set()
+    by_field: Counter[str] = Counter()
+
+    print(f"Checking {args.export} with {args.workers} workers ...", flush=True)
+    with (
+        args.output.open("w", newline="", encoding="utf-8") as out,
+        ProcessPoolExecutor(args.workers, initializer=init_worker, initargs=(reference,)) as pool,
+    ):
+        writer = csv.writer(out)
+        writer.writerow(["event", "field", "message"])
+
+        def collect(future: Future) -> None:
+            nonlocal checked
+            n, errors = future.result()
+            checked += n
+            for event_uid, field, message in errors:
+                failed_events.add(event_uid)
+                by_field[field] += 1
+                writer.writerow([event_uid, field, message])
+            print(f"  {checked} events checked", end="\r", flush=True)
+
+        if args.export.suffix.lower() == ".csv":
+            header, ranges = split_csv(args.export, CSV_PART_BYTES)
+            tasks = (pool.submit(check_csv_range, args.export, header, start, end) for start, end in ranges)
+        else:
+            tasks = (pool.submit(check_chunk, chunk) for chunk in chunked(read_json(args.export), args.chunk_size))
+
+        # Keep a bounded number of tasks in flight so memory stays flat
+        in_flight: deque[Future] = deque()
+        for task in tasks:
+            in_flight.append(task)
+            if len(in_flight) >= 2 * args.workers:
+                collect(in_flight.popleft())
+        while in_flight:
+            collect(in_flight.popleft())
+    print()
+
+    summary = {
+        "export": str(args.export),
+        "events_checked": checked,
+        "events_with_errors": len(failed_events),
+        "errors_by_field": {
+            field: {"label": FIELD_LABELS.get(field, field), "count": count}
+            for field, count in by_field.most_common()
+        },
+        "seconds": round(time.monotonic() - started, 1),
+    }
+    summary_path.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+
+    print("\nDone.")
+    print(f"  Events checked     : {checked}")
+    print(f"  Events with errors : {len(failed_events)}")
+    for field, count in by_field.most_common():
+        print(f"  {FIELD_LABELS.get(field, field):<40}: {count}")
+    print(f"  Errors  → {args.output}")
+    print(f"  Summary → {summary_path}")
+
+
+if __name__ == "__main__":
+    main()